@@ -1,16 +1,87 @@
+import json
+import os
+import sys
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 import janitor
+from pathlib import Path
+
+# Módulos compartidos con el dashboard (catálogo de códigos); el pipeline no importa nada de dashboard/
+sys.path.append(str(Path(__file__).resolve().parent.parent / "comun"))
+from catalogo import cargar_catalogo, codificar
 
 meses = ["enero","febrero","marzo","abril","mayo","junio",
          "julio","agosto","septiembre","octubre","noviembre","diciembre"]
 
 mes_a_num = {mes: i+1 for i, mes in enumerate(meses)}
 
+claves_agregacion = ['ano', 'cve_municipio', 'subtipo_de_delito']
+
+# Tope de filas por row group. Cada subtipo va además en sus propios row groups (escribir_particion):
+# un archivo (año, entidad) tiene ~50k filas, y con un solo row group el filtro por id_subtipo no descartaría nada
+filas_por_row_group = 50_000
+
+# dtypes del CSV crudo (por nombre ya limpio) para la lectura por bloques
+dtypes_sesnsp = {
+    'ano': 'int16',
+    'clave_ent': 'int8',
+    'cve_municipio': 'int32',
+    'entidad': 'category',
+    'municipio': 'category',
+    'bien_juridico_afectado': 'category',
+    'tipo_de_delito': 'category',
+    'subtipo_de_delito': 'category',
+    'modalidad': 'category',
+    **{mes: 'Int32' for mes in meses}
+}
+
 def leer_datos(path):
     ## Lee el CSV de "raw". Se actualiza mensualmente ##
     df = pd.read_csv(path, encoding = "latin1")
     return df.clean_names()
 
+def nombres_limpios(path):
+    ## Mapea encabezados crudos del CSV a los nombres que deja clean_names ##
+    crudos = pd.read_csv(path, encoding = "latin1", nrows = 0).columns
+    return dict(zip(crudos, pd.DataFrame(columns = crudos).clean_names().columns))
+
+def leer_por_bloques(path, tamano_bloque = 250_000):
+    ## Lee el CSV en bloques con dtypes explícitos y agrega cada bloque por año, municipio y subtipo ##
+    # Equivale a leer_datos -> recode_meses -> agregar_por_subtipo, con memoria acotada por el bloque
+    nombres = nombres_limpios(path)
+    crudos = {limpio: crudo for crudo, limpio in nombres.items()}
+    columnas = claves_agregacion + meses
+
+    acumulado = None
+    for bloque in pd.read_csv(path,
+                              encoding = "latin1",
+                              usecols = [crudos[c] for c in columnas],
+                              dtype = {crudos[c]: dtypes_sesnsp[c] for c in columnas},
+                              chunksize = tamano_bloque):
+        parcial = bloque.rename(columns = nombres) \
+        .groupby(claves_agregacion, observed = True, as_index = False)[meses].sum()
+
+        # Las sumas parciales se funden en cada bloque para no acumular copias
+        acumulado = parcial if acumulado is None else pd.concat([acumulado, parcial], ignore_index = True) \
+        .groupby(claves_agregacion, observed = True, as_index = False)[meses].sum()
+
+    acumulado['subtipo_de_delito'] = acumulado['subtipo_de_delito'].astype('category')
+    return acumulado
+
+def leer_claves(path):
+    ## Claves de municipio (con padding INEGI) y subtipos distintos del CSV, leyendo solo esas dos columnas ##
+    crudos = {limpio: crudo for crudo, limpio in nombres_limpios(path).items()}
+    columnas = ['cve_municipio', 'subtipo_de_delito']
+    claves = pd.read_csv(path,
+                         encoding = "latin1",
+                         usecols = [crudos[c] for c in columnas],
+                         dtype = {crudos[c]: dtypes_sesnsp[c] for c in columnas}) \
+    .rename(columns = {crudos[c]: c for c in columnas}) \
+    .drop_duplicates()
+    return pad_clave_inegi(claves)
+
 def recode_meses(df):
     ## Convierte cols de meses a int y strings a category para optimización ##
     for mes in meses:
@@ -19,24 +90,25 @@ def recode_meses(df):
 
 def agregar_por_subtipo(df):
     ## Agrega df por año, mes, municipio y subtipo de delito ##
-    return df.groupby(['ano', 'cve_municipio', 'subtipo_de_delito'], as_index = False) \
+    return df.groupby(claves_agregacion, as_index = False) \
     .agg({mes: "sum" for mes in meses})
 
 def pivotear_meses(df):
-    ## Pivot longer de las columnas de mes ##
-    return df.melt(
-        id_vars = ['ano', 'cve_municipio', 'subtipo_de_delito'],
-        value_vars = meses,
-        var_name = "mes",
-        value_name = "total"
-    )
+    ## Pivot longer de las columnas de mes, con el mes como código entero ##
+    # Mismo orden de filas que melt: todos los eneros, luego todos los febreros, ...
+    n = len(df)
+    largo = df[claves_agregacion].take(np.tile(np.arange(n), len(meses))).reset_index(drop = True)
+    mes_num = np.repeat(np.arange(1, len(meses) + 1, dtype = 'int8'), n)
+
+    largo['mes'] = pd.Categorical.from_codes(mes_num - 1, categories = meses)
+    largo['mes_num'] = mes_num
+    largo['total'] = pd.concat([df[mes] for mes in meses], ignore_index = True)
+    return largo
 
 def crear_fecha(df):
-    ## Genera mes numerico y crea columna de fecha ##
-    df['mes_num'] = df['mes'].map(mes_a_num)
-    df['fecha'] = pd.to_datetime(dict(year = df['ano'],
-                                      month = df['mes_num'],
-                                      day = 1))
+    ## Crea columna de fecha con aritmética de meses sobre datetime64[M] ##
+    meses_desde_1970 = (df['ano'].to_numpy('int64') - 1970) * 12 + df['mes_num'].to_numpy('int64') - 1
+    df['fecha'] = meses_desde_1970.astype('datetime64[M]').astype('datetime64[ns]')
     return df
 
 def pad_clave_inegi(df):
@@ -45,16 +117,130 @@ def pad_clave_inegi(df):
     return df
 
 def recode_categoricas(df):
-    ## Convierte columnas strings con campos repetidos en category ##
+    ## Convierte columnas strings con campos repetidos en category y fija el tipo de total ##
     df['subtipo_de_delito'] = df['subtipo_de_delito'].astype('category')
     df['mes_num'] = df['mes_num'].astype('category')
     df['mes'] = df['mes'].astype('category')
     df['ano'] = df['ano'].astype('category')
     df['cve_municipio'] = df['cve_municipio'].astype('category')
+    df['total'] = df['total'].astype('Int32')
+    return df
+
+def codificar_claves(df):
+    ## Agrega los códigos enteros estables del catálogo para municipio y subtipo ##
+    # Solo lee el catálogo; el script principal agrega antes las claves nuevas (actualizar_catalogo)
+    catalogo = cargar_catalogo()
+    df['id_municipio'] = codificar(df['cve_municipio'], catalogo['municipios'])
+    df['id_subtipo'] = codificar(df['subtipo_de_delito'], catalogo['subtipos'])
     return df
 
 def reordenar_cols(df):
     ## Reordena columnas para df final ##
-    return df[['ano','mes','mes_num','fecha','cve_municipio','subtipo_de_delito','total']]
+    return df[['ano','mes','mes_num','fecha','id_municipio','cve_municipio','id_subtipo','subtipo_de_delito','total']]
+
+# Etapas en orden; procesar y el Perfilador (Perfilado.py) recorren las mismas listas
+etapas_agregado = [pivotear_meses, crear_fecha, pad_clave_inegi, recode_categoricas, codificar_claves, reordenar_cols]
+etapas_procesar = [recode_meses, agregar_por_subtipo, *etapas_agregado]
+
+def aplicar_etapas(df, etapas):
+    ## df.pipe(etapa_1).pipe(etapa_2)... ##
+    for etapa in etapas:
+        df = df.pipe(etapa)
+    return df
+
+def procesar(df):
+    ## Pipeline completo desde el CSV crudo (ya con clean_names) al formato largo ##
+    return aplicar_etapas(df, etapas_procesar)
+
+def procesar_agregado(df):
+    ## Pipeline desde el agregado por año, municipio y subtipo al formato largo ##
+    return aplicar_etapas(df, etapas_agregado)
+
+def construir_cubo(df):
+    ## Arma cubo denso (subtipo, municipio, mes) y su suma acumulada en el tiempo ##
+    # Los ejes siguen el catálogo: el código de un municipio o subtipo es su posición en el cubo
+    catalogo = cargar_catalogo()
+    subtipos, municipios = catalogo['subtipos'], catalogo['municipios']
+    fechas = pd.date_range(df['fecha'].min(), df['fecha'].max(), freq='MS')
+
+    i_sub = df['id_subtipo'].to_numpy('int64')
+    i_mun = df['id_municipio'].to_numpy('int64')
+    i_mes = ((df['fecha'].dt.year - fechas[0].year) * 12
+             + (df['fecha'].dt.month - fechas[0].month)).to_numpy('int64')
+
+    forma = (len(subtipos), len(municipios), len(fechas))
+    posicion = np.ravel_multi_index((i_sub, i_mun, i_mes), forma)
+    cubo = np.bincount(
+        posicion,
+        weights = df['total'].fillna(0).to_numpy('float64'),
+        minlength = int(np.prod(forma))
+    ).astype('int32').reshape(forma)
+
+    # acumulado[..., t] = suma de los meses [0, t); el total de [i0, i1) es acumulado[i1] - acumulado[i0]
+    acumulado = np.zeros(forma[:2] + (forma[2] + 1,), dtype='int32')
+    np.cumsum(cubo, axis = 2, out = acumulado[:, :, 1:])
+
+    # Los meses aún no publicados del último año vienen vacíos y quedan en 0: el último publicado
+    # es el último con algún caso a nivel nacional
+    con_casos = np.flatnonzero(cubo.sum(axis = (0, 1)))
+    ultimo_mes = fechas[con_casos[-1]] if len(con_casos) else fechas[-1]
+
+    indices = {
+        'subtipos': subtipos,
+        'municipios': municipios,
+        'fecha_inicio': fechas[0].strftime('%Y-%m'),
+        'n_meses': len(fechas),
+        'ultimo_mes': ultimo_mes.strftime('%Y-%m'),
+        # Cambia en cada reconstrucción: invalida los caches del dashboard
+        'version': pd.Timestamp.now().strftime('%Y%m%d%H%M%S')
+    }
+    return cubo, acumulado, indices
+
+def reemplazar_archivo(path, escribir):
+    ## Escribe a un temporal y lo pone en su lugar con os.replace ##
+    # Quien tenga abierto el archivo anterior (mmap de los workers) sigue leyendo el inodo viejo completo
+    temporal = path.with_suffix(f".{os.getpid()}.tmp")
+    with open(temporal, "wb") as f:
+        escribir(f)
+    os.replace(temporal, path)
+
+def guardar_cubo(cubo, acumulado, indices, directorio):
+    ## Guarda el cubo como .npy (para abrir con mmap) y sus índices como json ##
+    # indices.json va al final: su mtime le indica al dashboard que ya hay un cubo nuevo completo
+    directorio = Path(directorio)
+    directorio.mkdir(parents = True, exist_ok = True)
+    reemplazar_archivo(directorio / "cubo.npy", lambda f: np.save(f, cubo))
+    reemplazar_archivo(directorio / "acumulado.npy", lambda f: np.save(f, acumulado))
+    reemplazar_archivo(directorio / "indices.json",
+                       lambda f: f.write(json.dumps(indices, ensure_ascii = False).encode("utf-8")))
+
+def nombre_particion(ano, clave_ent):
+    ## Ruta relativa (sin extensión) de la partición de un año y entidad ##
+    return f"{int(ano)}/{int(clave_ent):02d}"
+
+def escribir_particion(df, path):
+    ## Escribe un archivo del dataset en orden de catálogo (subtipo, fecha, municipio), con estadísticas por row group ##
+    # Dentro de cada subtipo las filas quedan en orden de fecha: los filtros por id_subtipo y
+    # por periodo descartan row groups completos usando min/max
+    df = df.sort_values(['id_subtipo', 'fecha', 'id_municipio'], ignore_index = True)
+    path = Path(path)
+    path.parent.mkdir(parents = True, exist_ok = True)
+    tabla = pa.Table.from_pandas(df, preserve_index = False)
+
+    # Un row group (o más, si pasa del tope) por subtipo: min/max de id_subtipo descartan los demás subtipos
+    cortes = [0, *(np.flatnonzero(np.diff(df['id_subtipo'].to_numpy())) + 1), len(df)]
+    with pq.ParquetWriter(path, tabla.schema, compression = "zstd", use_dictionary = True,
+                          write_statistics = True) as escritor:
+        for inicio, fin in zip(cortes[:-1], cortes[1:]):
+            escritor.write_table(tabla.slice(inicio, fin - inicio), row_group_size = filas_por_row_group)
 
+def escribir_dataset(df, dataset_dir):
+    ## Reescribe el dataset completo, un archivo por año y entidad ##
+    dataset_dir = Path(dataset_dir)
+    for viejo in dataset_dir.glob("*/*.parquet"):
+        viejo.unlink()
 
+    # Los dos primeros dígitos de la clave INEGI son la entidad
+    entidad = df['cve_municipio'].astype(str).str[:2]
+    for (ano, ent), idx in df.groupby([df['ano'].astype('int64'), entidad], observed = True).indices.items():
+        escribir_particion(df.iloc[idx], dataset_dir / f"{nombre_particion(ano, ent)}.parquet")
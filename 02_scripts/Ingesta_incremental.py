@@ -0,0 +1,62 @@
+import hashlib
+import json
+import pandas as pd
+from pathlib import Path
+from Funciones_Procesamiento import meses, procesar, nombre_particion, escribir_particion
+
+MANIFIESTO = "_manifiesto.json"  # pyarrow ignora archivos que empiezan con "_" al leer el dataset
+
+
+def huellas_por_particion(df):
+    ## Huella sha1 de cada rebanada (ano, clave_ent) del CSV crudo ##
+    # Los meses se fijan a Int32 antes del hash: read_csv infiere float64 para un mes todavía vacío
+    # e int64 cuando ya se publicó, y ese cambio de dtype cambiaría la huella de todas las particiones
+    df = df.assign(**{mes: pd.to_numeric(df[mes], errors = 'coerce').astype("Int32") for mes in meses})
+    filas = pd.util.hash_pandas_object(df, index = False).to_numpy()
+    grupos = df.groupby(['ano', 'clave_ent']).indices
+    return {
+        nombre_particion(ano, ent): hashlib.sha1(filas[idx].tobytes()).hexdigest()
+        for (ano, ent), idx in grupos.items()
+    }
+
+
+def leer_manifiesto(dataset_dir):
+    ## Huellas de la última ingesta (vacío si es la primera) ##
+    path = Path(dataset_dir) / MANIFIESTO
+    if not path.exists():
+        return {}
+    with open(path, encoding = "utf-8") as f:
+        return json.load(f)
+
+
+def guardar_manifiesto(huellas, dataset_dir):
+    with open(Path(dataset_dir) / MANIFIESTO, "w", encoding = "utf-8") as f:
+        json.dump(huellas, f, indent = 1, sort_keys = True)
+
+
+def ingesta_incremental(df_raw, dataset_dir):
+    ## Reprocesa solo las particiones (año, entidad) cuyo contenido cambió ##
+    dataset_dir = Path(dataset_dir)
+    nuevas = huellas_por_particion(df_raw)
+    anteriores = leer_manifiesto(dataset_dir)
+
+    cambiadas = sorted(p for p, h in nuevas.items() if anteriores.get(p) != h)
+    eliminadas = sorted(set(anteriores) - set(nuevas))
+
+    grupos = df_raw.groupby(['ano', 'clave_ent']).indices
+    for (ano, ent), idx in grupos.items():
+        particion = nombre_particion(ano, ent)
+        if particion not in cambiadas:
+            continue
+        escribir_particion(procesar(df_raw.iloc[idx].copy()), dataset_dir / f"{particion}.parquet")
+
+    for particion in eliminadas:
+        (dataset_dir / f"{particion}.parquet").unlink(missing_ok = True)
+
+    guardar_manifiesto(nuevas, dataset_dir)
+
+    return {
+        'cambiadas': cambiadas,
+        'eliminadas': eliminadas,
+        'sin_cambios': len(nuevas) - len(cambiadas)
+    }
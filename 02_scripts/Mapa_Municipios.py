@@ -1,11 +1,8 @@
 import geopandas as gpd
 import folium
 
-gdf = gpd.read_file('01_datos/raw/mg_2025_integrado/conjunto_de_datos/00mun.shp')
-
-gdf = gdf.to_crs(epsg=4326)
-
-gdf["geometry"] = gdf.geometry.simplify(tolerance=0.001, preserve_topology=True)
+## Nivel "local" precalculado por dashboard/Simplificar_geometrias.py ##
+gdf = gpd.read_parquet('01_datos/processed/geometrias/00mun_local.parquet')
 
 
 print(gdf.head())
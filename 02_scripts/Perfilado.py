@@ -0,0 +1,142 @@
+import cProfile
+import json
+import pstats
+import time
+import tracemalloc
+import pandas as pd
+from pathlib import Path
+
+REPORTE = "_reporte_procesamiento"  # con "_" inicial: pyarrow no lo toma como parte del dataset
+
+# Funciones listadas por etapa cuando se activa cProfile
+FUNCIONES_PERFIL = 15
+
+
+def nombre_etapa(funcion):
+    ## Nombre de la etapa; acepta functools.partial ##
+    return getattr(funcion, '__name__', None) or nombre_etapa(funcion.func)
+
+
+def describir(df):
+    ## Filas, memoria (deep) y dtypes de la entrada o salida de una etapa ##
+    if not isinstance(df, pd.DataFrame):
+        return {'filas': None, 'bytes': None, 'dtypes': {}}
+    return {
+        'filas': len(df),
+        'bytes': int(df.memory_usage(deep = True).sum()),
+        'dtypes': {str(c): str(t) for c, t in df.dtypes.items()}
+    }
+
+
+def cambios_dtype(antes, despues):
+    ## Columnas agregadas, eliminadas y con tipo distinto entre la entrada y la salida ##
+    return {
+        'agregadas': [c for c in despues if c not in antes],
+        'eliminadas': [c for c in antes if c not in despues],
+        'cambiadas': {c: [antes[c], t] for c, t in despues.items() if c in antes and antes[c] != t}
+    }
+
+
+def funciones_costosas(perfil, n = FUNCIONES_PERFIL):
+    ## Las n funciones con mayor tiempo acumulado de un perfil de cProfile ##
+    estadisticas = pstats.Stats(perfil).stats
+    filas = sorted(estadisticas.items(), key = lambda item: item[1][3], reverse = True)[:n]
+    return [
+        {'funcion': f"{archivo}:{linea}({nombre})", 'llamadas': nc, 'propio_s': tt, 'acumulado_s': ct}
+        for (archivo, linea, nombre), (cc, nc, tt, ct, _) in filas
+    ]
+
+
+class Perfilador:
+    ## Corre las etapas del pipeline una por una y registra tiempo, filas, memoria y dtypes ##
+
+    def __init__(self, cprofile = False, memoria = False):
+        self.cprofile = cprofile
+        self.memoria = memoria
+        self.inicio = pd.Timestamp.now()
+        self.etapas = []
+
+    def etapa(self, funcion, entrada):
+        ## Ejecuta funcion(entrada); la medición de memoria queda fuera del cronómetro ##
+        antes = describir(entrada)
+        perfil = cProfile.Profile() if self.cprofile else None
+        if self.memoria:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+
+        inicio = time.perf_counter()
+        if perfil is not None:
+            perfil.enable()
+        try:
+            salida = funcion(entrada)
+        finally:
+            if perfil is not None:
+                perfil.disable()
+        segundos = time.perf_counter() - inicio
+
+        registro = {'etapa': nombre_etapa(funcion), 'segundos': segundos}
+        if self.memoria:
+            registro['pico_tracemalloc_bytes'] = tracemalloc.get_traced_memory()[1]
+        despues = describir(salida)
+        registro.update({
+            'filas_entrada': antes['filas'],
+            'filas_salida': despues['filas'],
+            'bytes_entrada': antes['bytes'],
+            'bytes_salida': despues['bytes'],
+            'dtypes': cambios_dtype(antes['dtypes'], despues['dtypes'])
+        })
+        if perfil is not None:
+            registro['perfil'] = funciones_costosas(perfil)
+        self.etapas.append(registro)
+        return salida
+
+    def ejecutar(self, entrada, etapas):
+        ## Equivale a entrada.pipe(etapa_1).pipe(etapa_2)..., midiendo cada paso ##
+        for funcion in etapas:
+            entrada = self.etapa(funcion, entrada)
+        return entrada
+
+    def reporte(self):
+        return {
+            'inicio': self.inicio.isoformat(timespec = 'seconds'),
+            'total_s': sum(e['segundos'] for e in self.etapas),
+            'cprofile': self.cprofile,
+            'tracemalloc': self.memoria,
+            'etapas': self.etapas
+        }
+
+    def tabla(self):
+        ## Reporte legible: una fila por etapa ##
+        filas = []
+        for e in self.etapas:
+            cambios = e['dtypes']
+            fila = {
+                'etapa': e['etapa'],
+                'segundos': e['segundos'],
+                'filas_entrada': e['filas_entrada'],
+                'filas_salida': e['filas_salida'],
+                'mb_entrada': e['bytes_entrada'] / 2**20 if e['bytes_entrada'] is not None else None,
+                'mb_salida': e['bytes_salida'] / 2**20 if e['bytes_salida'] is not None else None,
+                'dtypes': ", ".join(
+                    [f"{c}: {a} -> {b}" for c, (a, b) in cambios['cambiadas'].items()]
+                    + [f"+{c}" for c in cambios['agregadas']]
+                    + [f"-{c}" for c in cambios['eliminadas']]
+                )
+            }
+            if self.memoria:
+                fila['mb_pico_tracemalloc'] = e['pico_tracemalloc_bytes'] / 2**20
+            filas.append(fila)
+        tabla = pd.DataFrame(filas).to_string(index = False, float_format = lambda x: f"{x:,.2f}")
+        return f"{tabla}\nTotal: {sum(e['segundos'] for e in self.etapas):.2f} s"
+
+    def guardar(self, directorio):
+        ## Escribe el reporte (json y tabla) junto al dataset ##
+        if self.memoria and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        directorio = Path(directorio)
+        directorio.mkdir(parents = True, exist_ok = True)
+        with open(directorio / f"{REPORTE}.json", "w", encoding = "utf-8") as f:
+            json.dump(self.reporte(), f, ensure_ascii = False, indent = 1)
+        with open(directorio / f"{REPORTE}.txt", "w", encoding = "utf-8") as f:
+            f.write(self.tabla() + "\n")
@@ -1,23 +1,86 @@
+import argparse
+import subprocess
+import sys
 import pandas as pd
+from functools import partial
+from pathlib import Path
 from Funciones_Procesamiento import *
+from catalogo import actualizar_catalogo
+from Ingesta_incremental import ingesta_incremental, huellas_por_particion, guardar_manifiesto, MANIFIESTO
+from Perfilado import Perfilador
+
+PATH_CSV = "01_datos/raw/Municipal-Delitos-2015-2025_nov2025/Municipal-Delitos - Noviembre 2025 (2015-2025).csv"
+PATH_DATASET = "01_datos/processed/Municipal-Delitos"
+PATH_CUBO = "01_datos/processed/Municipal-Delitos-cubo"
 
 if __name__ == "__main__":
-    path = "01_datos/raw/Municipal-Delitos-2015-2025_nov2025/Municipal-Delitos - Noviembre 2025 (2015-2025).csv"
+    parser = argparse.ArgumentParser(description = "Procesa el CSV municipal del SESNSP")
+    parser.add_argument("--path", default = PATH_CSV, help = "CSV crudo del SESNSP")
+    parser.add_argument("--incremental", action = "store_true",
+                        help = "Solo reprocesa las particiones (año, entidad) que cambiaron")
+    parser.add_argument("--bloques", type = int, default = None,
+                        help = "Lee el CSV en bloques de N filas (memoria acotada por el bloque)")
+    parser.add_argument("--engine", choices = ["pandas", "polars"], default = "pandas",
+                        help = "Motor para el procesamiento completo")
+    parser.add_argument("--verificar-paridad", action = "store_true",
+                        help = "Procesa con ambos motores y falla si el resultado difiere")
+    parser.add_argument("--cprofile", action = "store_true",
+                        help = "Agrega al reporte de etapas las funciones más costosas de cada una (cProfile)")
+    parser.add_argument("--tracemalloc", action = "store_true",
+                        help = "Agrega al reporte de etapas el pico de memoria asignada por Python (tracemalloc)")
+    parser.add_argument("--precalentar", action = "store_true",
+                        help = "Al terminar, precalcula el cache del dashboard (dashboard/Precalentar_cache.py)")
+    args = parser.parse_args()
+
+    ## Códigos enteros: las claves nuevas del CSV se agregan al catálogo una vez, antes de codificar ##
+    claves = leer_claves(args.path)
+    actualizar_catalogo(claves['cve_municipio'], claves['subtipo_de_delito'])
 
+    huellas = None
+    if args.incremental:
+        df_raw = leer_datos(args.path)
 
-df_final = (
-    leer_datos(path)
-    .pipe(recode_meses)
-    .pipe(agregar_por_subtipo)
-    .pipe(pivotear_meses)
-    .pipe(crear_fecha)
-    .pipe(pad_clave_inegi) 
-    .pipe(recode_categoricas)
-    .pipe(reordenar_cols)
-)
+        ## Actualiza el dataset particionado por año y lo vuelve a leer para el cubo ##
+        reporte = ingesta_incremental(df_raw, PATH_DATASET)
+        print(f"Particiones sin cambios: {reporte['sin_cambios']}")
+        print(f"Particiones reprocesadas ({len(reporte['cambiadas'])}): {', '.join(reporte['cambiadas'])}")
+        if reporte['eliminadas']:
+            print(f"Particiones eliminadas: {', '.join(reporte['eliminadas'])}")
+        df_final = pd.read_parquet(PATH_DATASET)
+    else:
+        if args.verificar_paridad:
+            from Procesamiento_polars import verificar_paridad
+            df_final = verificar_paridad(args.path)
+            print("Paridad pandas/polars: OK")
+        elif args.engine == "polars":
+            from Procesamiento_polars import procesar_polars
+            df_final = procesar_polars(args.path)
+        else:
+            ## Cada etapa se mide por separado; el reporte queda junto al dataset ##
+            perfilador = Perfilador(cprofile = args.cprofile, memoria = args.tracemalloc)
+            if args.bloques:
+                df_final = perfilador.ejecutar(args.path, [partial(leer_por_bloques, tamano_bloque = args.bloques),
+                                                           *etapas_agregado])
+            else:
+                df_raw = perfilador.etapa(leer_datos, args.path)
+                # Huellas del CSV tal como se leyó: recode_meses modifica df_raw
+                huellas = huellas_por_particion(df_raw)
+                df_final = perfilador.ejecutar(df_raw, etapas_procesar)
 
+            print(perfilador.tabla())
+            perfilador.guardar(PATH_DATASET)
 
-print(df_final.head(10))
+        ## Dataset particionado por año y entidad; el manifiesto habilita la siguiente ingesta incremental ##
+        escribir_dataset(df_final, PATH_DATASET)
+        if huellas is not None:
+            guardar_manifiesto(huellas, PATH_DATASET)
+        else:
+            Path(PATH_DATASET, MANIFIESTO).unlink(missing_ok = True)
 
-df_final.to_parquet("01_datos/processed/Municipal-Delitos.parquet", index = False)
+    ## Cubo (subtipo, municipio, mes) para consultas rápidas del dashboard ##
+    cubo, acumulado, indices = construir_cubo(df_final)
+    guardar_cubo(cubo, acumulado, indices, PATH_CUBO)
 
+    ## Las vistas más comunes quedan listas antes de que llegue el primer usuario ##
+    if args.precalentar:
+        subprocess.run([sys.executable, "Precalentar_cache.py"], cwd = "dashboard", check = True)
@@ -0,0 +1,78 @@
+import re
+import shutil
+import tempfile
+import unicodedata
+from contextlib import contextmanager
+from pathlib import Path
+import pandas as pd
+import polars as pl
+import pyarrow as pa
+from Funciones_Procesamiento import meses, mes_a_num, claves_agregacion, leer_datos, procesar, recode_categoricas, codificar_claves, reordenar_cols
+
+
+def limpiar_nombre(nombre):
+    ## Réplica de janitor.clean_names (opciones por defecto) para un solo encabezado ##
+    nombre = str(nombre).lower()
+    nombre = re.sub(r"[ /:,?()\.-]", "_", nombre)
+    nombre = re.sub(r"['’]", "", nombre)
+    nombre = nombre.replace("\xa0", "_")
+    nombre = "".join(c for c in unicodedata.normalize("NFD", nombre) if not unicodedata.combining(c))
+    return re.sub("_+", "_", nombre)
+
+
+@contextmanager
+def csv_utf8(path):
+    ## Copia temporal del CSV latin1 en UTF-8, transcodificada por bloques ##
+    # scan_csv solo lee UTF-8; latin1 asigna un carácter a cada byte, así que los bloques se cortan donde sea
+    with tempfile.TemporaryDirectory() as directorio:
+        destino = Path(directorio) / "sesnsp_utf8.csv"
+        with open(path, encoding = "latin1", newline = "") as origen, \
+             open(destino, "w", encoding = "utf-8", newline = "") as salida:
+            shutil.copyfileobj(origen, salida, 16 * 2**20)
+        yield destino
+
+
+def plan_polars(path_utf8):
+    ## Plan lazy con las mismas transformaciones que el pipeline de pandas ##
+    # scan_csv no lee nada hasta collect: polars lee el CSV en paralelo y ejecuta el plan completo multi-hilo
+    lf = pl.scan_csv(path_utf8, encoding = "utf8-lossy", infer_schema_length = 10_000)
+    lf = lf.rename({c: limpiar_nombre(c) for c in lf.collect_schema().names()})
+
+    return (
+        lf
+        # recode_meses
+        .with_columns([pl.col(mes).cast(pl.Int32, strict = False) for mes in meses])
+        # agregar_por_subtipo (ordenado igual que groupby de pandas)
+        .group_by(claves_agregacion)
+        .agg([pl.col(mes).sum() for mes in meses])
+        .sort(claves_agregacion)
+        # pivotear_meses
+        .unpivot(index = claves_agregacion, on = meses, variable_name = "mes", value_name = "total")
+        # crear_fecha
+        .with_columns(mes_num = pl.col("mes").replace_strict(mes_a_num, return_dtype = pl.Int8))
+        .with_columns(fecha = pl.date(pl.col("ano"), pl.col("mes_num"), 1).cast(pl.Datetime("ns")))
+        # pad_clave_inegi
+        .with_columns(cve_municipio = pl.col("cve_municipio").cast(pl.Utf8).str.zfill(5))
+    )
+
+
+def procesar_polars(path):
+    ## Ejecuta el plan y devuelve un df con el mismo esquema que el pipeline de pandas ##
+    with csv_utf8(path) as path_utf8:
+        df = plan_polars(path_utf8).collect().to_pandas()
+    # Mes como categórico de 12 niveles en orden de calendario, igual que pivotear_meses
+    df['mes'] = pd.Categorical(df['mes'], categories = meses)
+    return df.pipe(recode_categoricas).pipe(codificar_claves).pipe(reordenar_cols)
+
+
+def verificar_paridad(path):
+    ## Compara datos y esquema parquet de ambos motores; falla si difieren ##
+    df_pandas = procesar(leer_datos(path))
+    df_polars = procesar_polars(path)
+
+    pd.testing.assert_frame_equal(df_pandas, df_polars)
+    esquema_pandas = pa.Schema.from_pandas(df_pandas, preserve_index = False)
+    esquema_polars = pa.Schema.from_pandas(df_polars, preserve_index = False)
+    if not esquema_pandas.equals(esquema_polars, check_metadata = True):
+        raise AssertionError(f"Esquemas distintos:\n{esquema_pandas}\n---\n{esquema_polars}")
+    return df_pandas
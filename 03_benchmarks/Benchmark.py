@@ -0,0 +1,286 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import pandas as pd
+import psutil
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+BASE_DIR = BENCH_DIR.parent
+DASHBOARD_DIR = BASE_DIR / "dashboard"
+sys.path.insert(0, str(BASE_DIR / "02_scripts"))
+sys.path.insert(0, str(BASE_DIR / "comun"))
+sys.path.insert(0, str(DASHBOARD_DIR))
+
+import datos_sinteticos
+
+RESULTADOS_DIR = BENCH_DIR / "resultados"
+
+
+class MedidorRSS:
+    ## Pico de memoria residente de un proceso, muestreado en un hilo aparte ##
+
+    def __init__(self, proceso=None, intervalo=0.005):
+        self.proceso = proceso or psutil.Process()
+        self.intervalo = intervalo
+        self.inicial = self.pico = 0
+        self._fin = threading.Event()
+
+    def _rss(self):
+        try:
+            return self.proceso.memory_info().rss
+        except psutil.NoSuchProcess:
+            return 0
+
+    def _muestrear(self):
+        while not self._fin.wait(self.intervalo):
+            self.pico = max(self.pico, self._rss())
+
+    def __enter__(self):
+        self.inicial = self.pico = self._rss()
+        self._hilo = threading.Thread(target=self._muestrear, daemon=True)
+        self._hilo.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.pico = max(self.pico, self._rss())
+        self._fin.set()
+        self._hilo.join()
+
+
+def tamano_bytes(objeto):
+    ## Bytes de la salida de una etapa: memoria de un DataFrame/arreglo, o tamaño en disco ##
+    if objeto is None:
+        return None
+    if isinstance(objeto, (tuple, list)):
+        return sum(tamano_bytes(o) or 0 for o in objeto)
+    if isinstance(objeto, pd.DataFrame):
+        return int(objeto.memory_usage(deep=True).sum())
+    if isinstance(objeto, str):
+        return len(objeto.encode('utf-8'))
+    if isinstance(objeto, Path):
+        if objeto.is_dir():
+            return sum(p.stat().st_size for p in objeto.rglob("*") if p.is_file())
+        return objeto.stat().st_size if objeto.exists() else 0
+    if hasattr(objeto, 'nbytes'):
+        return int(objeto.nbytes)
+    return len(json.dumps(objeto, default=str).encode('utf-8'))
+
+
+def registro(etapa, tiempos, rss, salida):
+    return {
+        'etapa': etapa,
+        'repeticiones': len(tiempos),
+        'segundos': tiempos,
+        'mediana_s': statistics.median(tiempos),
+        'min_s': min(tiempos),
+        'rss_inicial_mb': rss.inicial / 2**20,
+        'rss_pico_mb': rss.pico / 2**20,
+        'bytes': tamano_bytes(salida)
+    }
+
+
+def medir(etapa, funcion, entradas, salida=None):
+    ## Cronometra funcion(*entrada) para cada entrada (una por repetición) ##
+    # Los DataFrames se copian fuera del cronómetro: varias etapas modifican su entrada
+    tiempos = []
+    with MedidorRSS() as rss:
+        for entrada in entradas:
+            entrada = [a.copy() if isinstance(a, pd.DataFrame) else a for a in entrada]
+            inicio = time.perf_counter()
+            resultado = funcion(*entrada)
+            tiempos.append(time.perf_counter() - inicio)
+    return resultado, registro(etapa, tiempos, rss, resultado if salida is None else salida)
+
+
+def medir_script(etapa, script, datos_dir, repeticiones, salida):
+    ## Corre un script del dashboard en un proceso aparte apuntado a los datos sintéticos ##
+    entorno = {**os.environ, 'INCIDENCIA_DATOS': str(datos_dir)}
+    tiempos = []
+    picos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        proceso = psutil.Popen([sys.executable, script], cwd=DASHBOARD_DIR, env=entorno,
+                               stdout=sys.stderr)
+        with MedidorRSS(proceso) as rss:
+            if proceso.wait() != 0:
+                raise RuntimeError(f"{script} terminó con código {proceso.returncode}")
+        tiempos.append(time.perf_counter() - inicio)
+        picos.append(rss)
+    return registro(etapa, tiempos, max(picos, key=lambda r: r.pico), salida)
+
+
+def etapas_procesamiento(path_csv, datos_dir, repeticiones):
+    ## Cada función de Funciones_Procesamiento por separado, más los artefactos que genera la ingesta ##
+    # Se importan aquí: el catálogo de códigos lee INCIDENCIA_DATOS al importarse
+    from Funciones_Procesamiento import (leer_datos, leer_claves, recode_meses, agregar_por_subtipo, pivotear_meses, crear_fecha,
+                                         pad_clave_inegi, recode_categoricas, codificar_claves, reordenar_cols,
+                                         procesar, leer_por_bloques, escribir_dataset,
+                                         construir_cubo, guardar_cubo)
+    from Procesamiento_datos_SESNSP import PATH_DATASET, PATH_CUBO
+    from catalogo import actualizar_catalogo
+    resultados = []
+
+    def etapa(nombre, funcion, *args, salida=None):
+        resultado, reg = medir(nombre, funcion, [args] * repeticiones, salida)
+        resultados.append(reg)
+        print(f"  {nombre:<28}{reg['mediana_s']:>9.3f} s", file=sys.stderr)
+        return resultado
+
+    # Como en el script principal, el catálogo se actualiza una vez antes de las etapas
+    claves = etapa('leer_claves', leer_claves, path_csv)
+    actualizar_catalogo(claves['cve_municipio'], claves['subtipo_de_delito'])
+
+    df_raw = etapa('leer_datos', leer_datos, path_csv)
+    df = etapa('recode_meses', recode_meses, df_raw)
+    df = etapa('agregar_por_subtipo', agregar_por_subtipo, df)
+    df = etapa('pivotear_meses', pivotear_meses, df)
+    df = etapa('crear_fecha', crear_fecha, df)
+    df = etapa('pad_clave_inegi', pad_clave_inegi, df)
+    df = etapa('recode_categoricas', recode_categoricas, df)
+    df = etapa('codificar_claves', codificar_claves, df)
+    df_final = etapa('reordenar_cols', reordenar_cols, df)
+    etapa('procesar', procesar, df_raw)
+    etapa('leer_por_bloques', leer_por_bloques, path_csv)
+
+    dataset_dir = datos_dir / Path(PATH_DATASET).relative_to("01_datos")
+    etapa('escribir_dataset', escribir_dataset, df_final, dataset_dir, salida=dataset_dir)
+    cubo = etapa('construir_cubo', construir_cubo, df_final)
+    cubo_dir = datos_dir / Path(PATH_CUBO).relative_to("01_datos")
+    etapa('guardar_cubo', guardar_cubo, *cubo, cubo_dir, salida=cubo_dir)
+    return resultados
+
+
+def etapas_callback(consultas, repeticiones):
+    ## actualizar_mapa_y_resumen de app_v4 completo: render sin cache y con cache ##
+    # Se importa aquí: sus módulos leen INCIDENCIA_DATOS al importarse
+    import app_v4
+    from datos import obtener_cubo
+
+    callback = getattr(app_v4.actualizar_mapa_y_resumen, '__wrapped__', app_v4.actualizar_mapa_y_resumen)
+    cubo = obtener_cubo()
+    inicio, fin = cubo.fechas[max(cubo.n_publicados - 12, 0)], cubo.ultimo_mes
+
+    # Un subtipo distinto por consulta: ninguna encuentra el mapa en cache
+    entradas = [(s, inicio, fin) for s in cubo.subtipos[:consultas]]
+    resultados = []
+    _, reg = medir('actualizar_mapa_y_resumen', callback, entradas)
+    resultados.append(reg)
+    _, reg = medir('actualizar_mapa_y_resumen_cache', callback, entradas * repeticiones)
+    resultados.append(reg)
+    for reg in resultados:
+        print(f"  {reg['etapa']:<28}{reg['mediana_s']:>9.3f} s  {reg['bytes'] / 2**20:>8.1f} MB", file=sys.stderr)
+    return resultados
+
+
+def comparar(actual, anterior, umbral):
+    ## Tabla de medianas contra una corrida previa; devuelve las etapas que empeoraron ##
+    previas = {r['etapa']: r for r in anterior['resultados']}
+    filas = []
+    for r in actual['resultados']:
+        previa = previas.get(r['etapa'])
+        razon = r['mediana_s'] / previa['mediana_s'] if previa and previa['mediana_s'] > 0 else None
+        filas.append({
+            'etapa': r['etapa'],
+            'anterior_s': previa['mediana_s'] if previa else None,
+            'actual_s': r['mediana_s'],
+            'razon': razon,
+            'regresion': razon is not None and razon > umbral
+        })
+    tabla = pd.DataFrame(filas)
+    print(tabla.to_string(index=False, float_format=lambda x: f"{x:.3f}"))
+    return tabla.loc[tabla['regresion'], 'etapa'].tolist()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Benchmark del procesamiento y del dashboard con datos sintéticos del SESNSP")
+    parser.add_argument("--anos", type = int, nargs = 2, default = [2015, 2025], metavar = ("INICIO", "FIN"),
+                        help = "Años del CSV sintético")
+    parser.add_argument("--municipios", type = int, default = 2470)
+    parser.add_argument("--subtipos", type = int, default = 55)
+    parser.add_argument("--modalidades", type = int, default = 2, help = "Filas por subtipo (modalidades) en el CSV")
+    parser.add_argument("--semilla", type = int, default = 0)
+    parser.add_argument("--repeticiones", type = int, default = 3)
+    parser.add_argument("--consultas", type = int, default = 5, help = "Renders sin cache del callback (un subtipo cada uno)")
+    parser.add_argument("--datos", default = None,
+                        help = "Carpeta para los datos sintéticos (por defecto una temporal que se borra al terminar)")
+    parser.add_argument("--salida", default = None, help = "JSON de resultados (por defecto 03_benchmarks/resultados/<fecha>.json)")
+    parser.add_argument("--comparar", default = None, help = "JSON de una corrida previa contra el cual comparar")
+    parser.add_argument("--umbral", type = float, default = 1.2,
+                        help = "Razón de medianas a partir de la cual una etapa cuenta como regresión")
+    args = parser.parse_args()
+
+    datos_dir = Path(args.datos or tempfile.mkdtemp(prefix = "incidencia_bench_"))
+    # Todos los módulos del dashboard (y sus caches en disco) leen y escriben en la carpeta sintética
+    os.environ['INCIDENCIA_DATOS'] = str(datos_dir)
+    shutil.rmtree(datos_dir / "cache", ignore_errors = True)
+
+    parametros = {
+        'anos': args.anos,
+        'n_municipios': args.municipios,
+        'n_subtipos': args.subtipos,
+        'modalidades': args.modalidades,
+        'semilla': args.semilla,
+        'repeticiones': args.repeticiones,
+        'consultas': args.consultas
+    }
+
+    try:
+        print("Generando datos sintéticos...", file = sys.stderr)
+        inicio = time.perf_counter()
+        path_csv, path_shp = datos_sinteticos.generar(
+            datos_dir,
+            anos = range(args.anos[0], args.anos[1] + 1),
+            n_municipios = args.municipios,
+            n_subtipos = args.subtipos,
+            modalidades = args.modalidades,
+            semilla = args.semilla
+        )
+        print(f"  {tamano_bytes(path_csv) / 2**20:.0f} MB de CSV en {time.perf_counter() - inicio:.1f} s", file = sys.stderr)
+
+        print("Procesamiento:", file = sys.stderr)
+        resultados = etapas_procesamiento(path_csv, datos_dir, args.repeticiones)
+
+        print("Geometrías:", file = sys.stderr)
+        geometrias_dir = datos_dir / "processed/geometrias"
+        resultados.append(medir_script('Simplificar_geometrias', "Simplificar_geometrias.py",
+                                       datos_dir, args.repeticiones, geometrias_dir))
+
+        print("Dashboard:", file = sys.stderr)
+        resultados += etapas_callback(args.consultas, args.repeticiones)
+    finally:
+        if args.datos is None:
+            shutil.rmtree(datos_dir, ignore_errors = True)
+
+    reporte = {
+        'fecha': pd.Timestamp.now().isoformat(timespec = 'seconds'),
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'cpus': os.cpu_count(),
+        'versiones': {m: sys.modules[m].__version__ for m in ('pandas', 'numpy', 'pyarrow', 'shapely', 'geopandas')
+                      if m in sys.modules},
+        'parametros': parametros,
+        'resultados': resultados
+    }
+
+    salida = Path(args.salida) if args.salida else RESULTADOS_DIR / f"{pd.Timestamp.now():%Y%m%d-%H%M%S}.json"
+    salida.parent.mkdir(parents = True, exist_ok = True)
+    with open(salida, "w", encoding = "utf-8") as f:
+        json.dump(reporte, f, ensure_ascii = False, indent = 1)
+
+    tabla = pd.DataFrame(resultados)[['etapa', 'mediana_s', 'min_s', 'rss_pico_mb', 'bytes']]
+    print(tabla.to_string(index = False, float_format = lambda x: f"{x:.3f}"))
+    print(f"Resultados en {salida}")
+
+    if args.comparar:
+        with open(args.comparar, encoding = "utf-8") as f:
+            regresiones = comparar(reporte, json.load(f), args.umbral)
+        if regresiones:
+            sys.exit(f"Regresiones (> {args.umbral:.2f}x): {', '.join(regresiones)}")
@@ -0,0 +1,151 @@
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+import shapely
+from pathlib import Path
+
+# Encabezados del CSV municipal del SESNSP, tal como vienen en el archivo crudo
+COLUMNAS_SESNSP = ["Año", "Clave_Ent", "Entidad", "Cve. Municipio", "Municipio",
+                   "Bien jurídico afectado", "Tipo de delito", "Subtipo de delito", "Modalidad",
+                   "Enero", "Febrero", "Marzo", "Abril", "Mayo", "Junio",
+                   "Julio", "Agosto", "Septiembre", "Octubre", "Noviembre", "Diciembre"]
+
+# Rutas relativas a la carpeta de datos (misma estructura que 01_datos)
+RUTA_CSV = "raw/Municipal-Delitos-sintetico.csv"
+RUTA_SHAPEFILE = "raw/mg_2025_integrado/conjunto_de_datos/00mun.shp"
+
+# Extensión aproximada de México (lon/lat)
+EXTENSION = (-117.0, 14.5, -86.7, 32.7)
+
+N_ENTIDADES = 32
+
+
+def claves_municipio(n_municipios):
+    ## Claves (entidad, municipio) repartidas en las 32 entidades, como en el catálogo INEGI ##
+    ent = 1 + np.arange(n_municipios) * N_ENTIDADES // n_municipios
+    # Número de municipio consecutivo dentro de cada entidad
+    inicio_ent = np.searchsorted(ent, ent)
+    mun = np.arange(n_municipios) - inicio_ent + 1
+    return ent, mun
+
+
+def generar_csv(path, anos=range(2015, 2026), n_municipios=2470, n_subtipos=55,
+                modalidades=2, meses_ultimo_ano=11, semilla=0):
+    ## CSV sintético con las columnas y codificación (latin1) del SESNSP ##
+    # Una fila por año, municipio, subtipo y modalidad; los meses posteriores al último
+    # publicado quedan vacíos, como en el archivo real
+    rng = np.random.default_rng(semilla)
+    anos = np.asarray(list(anos))
+    ent, mun = claves_municipio(n_municipios)
+
+    n_filas_ano = n_municipios * n_subtipos * modalidades
+    i_mun = np.tile(np.repeat(np.arange(n_municipios), n_subtipos * modalidades), len(anos))
+    i_sub = np.tile(np.repeat(np.arange(n_subtipos), modalidades), n_municipios * len(anos))
+    i_mod = np.tile(np.arange(modalidades), n_municipios * n_subtipos * len(anos))
+    ano = np.repeat(anos, n_filas_ano)
+
+    # Incidencia por municipio y subtipo con colas largas: pocos municipios concentran los casos
+    tasa_mun = rng.lognormal(0, 1.2, n_municipios)
+    tasa_sub = rng.lognormal(-1, 1.0, n_subtipos)
+    tasa = tasa_mun[i_mun] * tasa_sub[i_sub] / modalidades
+    valores = rng.poisson(tasa[:, None], size=(len(tasa), 12)).astype('float64')
+    valores[np.ix_(ano == anos[-1], np.arange(meses_ultimo_ano, 12))] = np.nan
+
+    subtipos = np.array([f"Subtipo {i:02d}" for i in range(n_subtipos)], dtype=object)
+    # El primero se llama como el valor inicial del dropdown de los dashboards
+    subtipos[0] = "Homicidio doloso"
+    df = pd.DataFrame({
+        "Año": ano,
+        "Clave_Ent": ent[i_mun],
+        "Entidad": pd.Categorical.from_codes(ent[i_mun] - 1, [f"Entidad {e:02d}" for e in range(1, N_ENTIDADES + 1)]),
+        "Cve. Municipio": ent[i_mun] * 1000 + mun[i_mun],
+        "Municipio": pd.Categorical.from_codes(i_mun, [f"Municipio {i:04d}" for i in range(n_municipios)]),
+        "Bien jurídico afectado": pd.Categorical.from_codes(i_sub % 5, [f"Bien jurídico {i}" for i in range(5)]),
+        "Tipo de delito": pd.Categorical.from_codes(i_sub // 3, [f"Tipo {i:02d}" for i in range((n_subtipos + 2) // 3)]),
+        "Subtipo de delito": pd.Categorical.from_codes(i_sub, subtipos),
+        "Modalidad": pd.Categorical.from_codes(i_mod, [f"Modalidad {i}" for i in range(modalidades)]),
+        **{mes: pd.array(valores[:, i], dtype='Int32') for i, mes in enumerate(COLUMNAS_SESNSP[9:])}
+    }, columns=COLUMNAS_SESNSP)
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    df.to_csv(path, index=False, encoding="latin1")
+    return path
+
+
+def _aristas(n, puntos, amplitud, rng):
+    ## Desplazamiento perpendicular de los puntos interiores de n aristas, nulo en los extremos ##
+    t = np.linspace(0, 1, puntos + 2)[1:-1]
+    return amplitud * np.sin(np.pi * t) * rng.uniform(-1, 1, (n, puntos))
+
+
+def generar_poligonos(path, n_municipios=2470, puntos_por_arista=24, semilla=0):
+    ## Cobertura sintética de municipios (sin huecos ni traslapes) guardada como shapefile ##
+    # Una malla deformada: cada arista interior es una línea quebrada compartida por los dos
+    # vecinos, así que simplificar_arcos tiene arcos compartidos que simplificar
+    rng = np.random.default_rng(semilla)
+    x0, y0, x1, y1 = EXTENSION
+    nx = int(np.ceil(np.sqrt(n_municipios * (x1 - x0) / (y1 - y0))))
+    ny = int(np.ceil(n_municipios / nx))
+    dx, dy = (x1 - x0) / nx, (y1 - y0) / ny
+
+    # Vértices de la malla, movidos al azar salvo en el borde exterior
+    gx, gy = np.meshgrid(np.linspace(x0, x1, nx + 1), np.linspace(y0, y1, ny + 1), indexing='ij')
+    interior = np.zeros_like(gx, dtype=bool)
+    interior[1:-1, 1:-1] = True
+    gx = gx + interior * rng.uniform(-0.15, 0.15, gx.shape) * dx
+    gy = gy + interior * rng.uniform(-0.15, 0.15, gy.shape) * dy
+
+    t = np.linspace(0, 1, puntos_por_arista + 2)[1:-1]
+
+    # Aristas horizontales (i, j) -> (i+1, j), con ruido en y; el borde exterior queda recto
+    hx = gx[:-1, :, None] + (gx[1:, :, None] - gx[:-1, :, None]) * t
+    hy = gy[:-1, :, None] + (gy[1:, :, None] - gy[:-1, :, None]) * t
+    ruido = _aristas(nx * (ny + 1), puntos_por_arista, 0.1 * dy, rng).reshape(nx, ny + 1, -1)
+    ruido[:, [0, -1]] = 0
+    hy = hy + ruido
+
+    # Aristas verticales (i, j) -> (i, j+1), con ruido en x
+    vx = gx[:, :-1, None] + (gx[:, 1:, None] - gx[:, :-1, None]) * t
+    vy = gy[:, :-1, None] + (gy[:, 1:, None] - gy[:, :-1, None]) * t
+    ruido = _aristas((nx + 1) * ny, puntos_por_arista, 0.1 * dx, rng).reshape(nx + 1, ny, -1)
+    ruido[[0, -1]] = 0
+    vx = vx + ruido
+
+    # Anillo de cada celda: abajo, derecha, arriba (invertida), izquierda (invertida)
+    i, j = np.divmod(np.arange(n_municipios), ny)
+    esquina = lambda a, b: np.column_stack([gx[a, b], gy[a, b]])[:, None, :]
+    anillos = np.concatenate([
+        esquina(i, j),
+        np.stack([hx[i, j], hy[i, j]], axis=-1),
+        esquina(i + 1, j),
+        np.stack([vx[i + 1, j], vy[i + 1, j]], axis=-1),
+        esquina(i + 1, j + 1),
+        np.stack([hx[i, j + 1], hy[i, j + 1]], axis=-1)[:, ::-1],
+        esquina(i, j + 1),
+        np.stack([vx[i, j], vy[i, j]], axis=-1)[:, ::-1],
+        esquina(i, j)
+    ], axis=1)
+
+    ent, mun = claves_municipio(n_municipios)
+    gdf = gpd.GeoDataFrame({
+        'CVEGEO': [f"{e:02d}{m:03d}" for e, m in zip(ent, mun)],
+        'CVE_ENT': [f"{e:02d}" for e in ent],
+        'CVE_MUN': [f"{m:03d}" for m in mun],
+        'NOMGEO': [f"Municipio {k:04d}" for k in range(n_municipios)]
+    }, geometry=shapely.polygons(anillos), crs="EPSG:4326")
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    gdf.to_file(path)
+    return path
+
+
+def generar(directorio, **parametros):
+    ## CSV y shapefile sintéticos dentro de una carpeta de datos con la estructura de 01_datos ##
+    directorio = Path(directorio)
+    semilla = parametros.get('semilla', 0)
+    n_municipios = parametros.get('n_municipios', 2470)
+    generar_csv(directorio / RUTA_CSV, **parametros)
+    generar_poligonos(directorio / RUTA_SHAPEFILE, n_municipios=n_municipios, semilla=semilla)
+    return directorio / RUTA_CSV, directorio / RUTA_SHAPEFILE
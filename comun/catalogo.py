@@ -0,0 +1,64 @@
+import json
+import os
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+# Módulo compartido por el pipeline (02_scripts) y el dashboard: ninguno depende del otro
+
+# Misma carpeta de datos que dashboard/rutas.py (INCIDENCIA_DATOS la redirige)
+DATOS_DIR = Path(os.environ.get("INCIDENCIA_DATOS", Path(__file__).resolve().parent.parent / "01_datos"))
+
+# Catálogo de códigos enteros: la posición de cada clave en su lista es su código
+# Solo crece por el final, así que un código asignado nunca cambia
+CATALOGO_PATH = DATOS_DIR / "processed/catalogo.json"
+
+
+def cargar_catalogo(path=CATALOGO_PATH):
+    ## Claves de municipio (CVEGEO) y subtipos en orden de código; vacío si aún no existe ##
+    if not path.exists():
+        return {'municipios': [], 'subtipos': []}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _unicas(claves):
+    ## Claves distintas como str; en un categórico basta con leer sus categorías ##
+    claves = pd.Series(claves)
+    if isinstance(claves.dtype, pd.CategoricalDtype):
+        return set(claves.cat.categories.astype(str))
+    return set(pd.unique(claves.astype(str)))
+
+
+def actualizar_catalogo(municipios=(), subtipos=(), path=CATALOGO_PATH):
+    ## Agrega al final (en orden) las claves nuevas; las existentes conservan su código ##
+    catalogo = cargar_catalogo(path)
+    nuevas = {
+        campo: sorted(_unicas(claves) - set(catalogo[campo]))
+        for campo, claves in (('municipios', municipios), ('subtipos', subtipos))
+    }
+    if any(nuevas.values()):
+        for campo, claves in nuevas.items():
+            catalogo[campo] = catalogo[campo] + claves
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temporal = path.with_suffix(f".{os.getpid()}.tmp")
+        with open(temporal, "w", encoding="utf-8") as f:
+            json.dump(catalogo, f, ensure_ascii=False, indent=1)
+        os.replace(temporal, path)
+    return catalogo
+
+
+def codificar(claves, lista):
+    ## Código int32 de cada clave según su posición en la lista del catálogo ##
+    claves = pd.Series(claves)
+    indice = pd.Index(lista)
+    if isinstance(claves.dtype, pd.CategoricalDtype):
+        # Se resuelve una vez por categoría y se reparte con los códigos del categórico
+        por_categoria = indice.get_indexer(claves.cat.categories.astype(str))
+        codigos = np.where(claves.cat.codes.to_numpy() < 0, -1, por_categoria[claves.cat.codes.to_numpy()])
+    else:
+        codigos = indice.get_indexer(claves.astype(str))
+    if (codigos < 0).any():
+        faltantes = pd.unique(claves[codigos < 0].astype(str))[:5]
+        raise KeyError(f"Claves fuera del catálogo: {', '.join(faltantes)}")
+    return codigos.astype('int32')
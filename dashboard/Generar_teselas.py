@@ -0,0 +1,126 @@
+import gzip
+import hashlib
+import json
+import os
+import sqlite3
+import numpy as np
+import geopandas as gpd
+import mapbox_vector_tile
+import shapely
+from geometrias import SHAPEFILE_PATH, ordenar_por_catalogo, simplificar_arcos
+from rutas import DATOS_DIR
+from catalogo import actualizar_catalogo
+
+# --- Rutas ---
+output_path = DATOS_DIR / "processed/00mun.mbtiles"
+
+# --- Parámetros de la pirámide ---
+ZOOM_MIN = 3
+ZOOM_MAX = 10
+EXTENT = 4096          # resolución interna de cada tesela
+BUFFER = 64            # margen (en unidades de tesela) para que no se vean cortes en los bordes
+ORIGEN = 20037508.342789244  # límite de EPSG:3857 en metros
+
+
+def limites_tesela(z, x, y):
+    ## Caja (minx, miny, maxx, maxy) en EPSG:3857 de la tesela XYZ ##
+    tamano = 2 * ORIGEN / 2 ** z
+    minx = -ORIGEN + x * tamano
+    maxy = ORIGEN - y * tamano
+    return minx, maxy - tamano, minx + tamano, maxy
+
+
+def teselas_en_caja(z, minx, miny, maxx, maxy):
+    ## Índices XYZ de las teselas que cubren una caja en EPSG:3857 ##
+    tamano = 2 * ORIGEN / 2 ** z
+    x0, x1 = int((minx + ORIGEN) // tamano), int((maxx + ORIGEN) // tamano)
+    y0, y1 = int((ORIGEN - maxy) // tamano), int((ORIGEN - miny) // tamano)
+    for x in range(x0, x1 + 1):
+        for y in range(y0, y1 + 1):
+            yield x, y
+
+
+def crear_mbtiles(path):
+    ## Crea el archivo MBTiles (SQLite) con su esquema estándar, más el ETag de cada tesela ##
+    path.unlink(missing_ok=True)
+    con = sqlite3.connect(path)
+    con.execute("CREATE TABLE metadata (name TEXT, value TEXT)")
+    con.execute("CREATE TABLE tiles (zoom_level INTEGER, tile_column INTEGER, tile_row INTEGER, tile_data BLOB)")
+    con.execute("CREATE UNIQUE INDEX tile_index ON tiles (zoom_level, tile_column, tile_row)")
+    # Tabla extra (fuera del estándar): el servidor no recalcula el md5 en cada petición
+    con.execute("CREATE TABLE etags (zoom_level INTEGER, tile_column INTEGER, tile_row INTEGER, etag TEXT)")
+    con.execute("CREATE UNIQUE INDEX etag_index ON etags (zoom_level, tile_column, tile_row)")
+    return con
+
+
+if __name__ == "__main__":
+    # --- Cargar shapefile en CRS métrico ---
+    gdf = gpd.read_file(SHAPEFILE_PATH)
+    actualizar_catalogo(municipios=gdf['CVEGEO'])
+    gdf = ordenar_por_catalogo(gdf)
+    gdf_m = gdf.to_crs(epsg=3857)
+
+    geometrias = np.asarray(gdf_m.geometry.array)
+    claves = gdf_m['CVEGEO'].to_numpy()
+    ids = gdf_m['id_municipio'].to_numpy()
+    nombres = gdf_m['NOMGEO'].to_numpy()
+    arbol = shapely.STRtree(geometrias)
+
+    # Se escribe aparte y se reemplaza al final: el servidor nunca ve un MBTiles a medias
+    temporal = output_path.with_suffix(f".{os.getpid()}.tmp")
+    con = crear_mbtiles(temporal)
+    n_teselas = 0
+
+    for z in range(ZOOM_MIN, ZOOM_MAX + 1):
+        # Tolerancia = una unidad de tesela: el detalle que se pierde no es visible a ese zoom
+        tolerancia = 2 * ORIGEN / 2 ** z / EXTENT
+        simplificadas = simplificar_arcos(geometrias, tolerancia)
+
+        for x, y in teselas_en_caja(z, *gdf_m.total_bounds):
+            minx, miny, maxx, maxy = limites_tesela(z, x, y)
+            margen = (maxx - minx) * BUFFER / EXTENT
+            idx = arbol.query(shapely.box(minx - margen, miny - margen, maxx + margen, maxy + margen))
+            if len(idx) == 0:
+                continue
+
+            recortadas = shapely.clip_by_rect(simplificadas[idx], minx - margen, miny - margen, maxx + margen, maxy + margen)
+            features = [
+                {'geometry': g, 'properties': {'id_municipio': int(i), 'cve_municipio': c, 'NOMGEO': n}}
+                for g, i, c, n in zip(recortadas, ids[idx], claves[idx], nombres[idx])
+                if not g.is_empty
+            ]
+            if not features:
+                continue
+
+            tesela = mapbox_vector_tile.encode(
+                [{'name': 'municipios', 'features': features}],
+                default_options={'quantize_bounds': (minx, miny, maxx, maxy), 'extents': EXTENT}
+            )
+            # MBTiles usa filas TMS (origen abajo)
+            datos = gzip.compress(tesela)
+            con.execute("INSERT INTO tiles VALUES (?, ?, ?, ?)", (z, x, 2 ** z - 1 - y, datos))
+            con.execute("INSERT INTO etags VALUES (?, ?, ?, ?)", (z, x, 2 ** z - 1 - y, hashlib.md5(datos).hexdigest()))
+            n_teselas += 1
+
+        print(f"zoom {z}: {n_teselas} teselas acumuladas")
+
+    # --- Metadatos MBTiles ---
+    lon_min, lat_min, lon_max, lat_max = gdf.to_crs(epsg=4326).total_bounds
+    metadata = {
+        'name': 'municipios',
+        'format': 'pbf',
+        'minzoom': ZOOM_MIN,
+        'maxzoom': ZOOM_MAX,
+        'bounds': f"{lon_min},{lat_min},{lon_max},{lat_max}",
+        'center': f"{(lon_min + lon_max) / 2},{(lat_min + lat_max) / 2},{ZOOM_MIN + 2}",
+        'json': json.dumps({'vector_layers': [{
+            'id': 'municipios',
+            'fields': {'id_municipio': 'Number', 'cve_municipio': 'String', 'NOMGEO': 'String'},
+            'minzoom': ZOOM_MIN,
+            'maxzoom': ZOOM_MAX
+        }]})
+    }
+    con.executemany("INSERT INTO metadata VALUES (?, ?)", [(k, str(v)) for k, v in metadata.items()])
+    con.commit()
+    con.close()
+    os.replace(temporal, output_path)
@@ -0,0 +1,69 @@
+import argparse
+import time
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from cache import CACHE_MAPAS_DIR
+from datos import obtener_cubo
+# Los procesos del pool usan la misma función de render y la misma clave de cache que el callback
+import app_v4
+
+
+def periodos_estandar(cubo):
+    ## Últimos 12 meses, año en curso y último año completo, contados hasta el último mes publicado ##
+    ultimo = cubo.ultimo_mes
+    periodos = [
+        (cubo.fechas[max(cubo.n_publicados - 12, 0)], ultimo),
+        (pd.Timestamp(ultimo.year, 1, 1), ultimo),
+        (pd.Timestamp(ultimo.year - 1, 1, 1), pd.Timestamp(ultimo.year - 1, 12, 1))
+    ]
+    # Sin duplicados (p. ej. si el último año ya está completo)
+    return list(dict.fromkeys(
+        (inicio.strftime('%Y-%m'), fin.strftime('%Y-%m')) for inicio, fin in periodos
+    ))
+
+
+def subtipos_frecuentes(cubo, n):
+    ## Los n subtipos con más casos en los últimos 12 meses publicados ##
+    i1 = cubo.n_publicados
+    casos = (cubo.acumulado[:, :, i1].astype('int64') - cubo.acumulado[:, :, max(i1 - 12, 0)]).sum(axis=1)
+    return [cubo.subtipos[i] for i in np.argsort(-casos, kind='stable')[:n]]
+
+
+def _precalentar(tarea):
+    ## Renderiza un mapa; cache_mapas lo escribe al disco que leen los workers del dashboard ##
+    # El costo en frío es el render de Kepler (segundos); los totales del cubo toman microsegundos
+    subtipo, inicio, fin, nivel = tarea
+    app_v4.actualizar_mapa_y_resumen(subtipo, inicio, fin, nivel)
+    return tarea
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Renderiza los mapas de las vistas más comunes de app_v4")
+    parser.add_argument("--subtipos", type = int, default = 10,
+                        help = "Subtipos con más casos a precalentar, además del inicial del dashboard")
+    parser.add_argument("--procesos", type = int, default = 2,
+                        help = "Procesos del pool (cada uno carga geometría y keplergl)")
+    args = parser.parse_args()
+
+    cubo = obtener_cubo()
+    # La vista inicial en ambos niveles; las demás en el nivel con el que abre el dashboard
+    inicial = (app_v4.SUBTIPO_INICIAL, *(pd.Timestamp(f).strftime('%Y-%m') for f in app_v4.PERIODO_INICIAL))
+    subtipos = list(dict.fromkeys([app_v4.SUBTIPO_INICIAL, *subtipos_frecuentes(cubo, args.subtipos)]))
+    tareas = list(dict.fromkeys([
+        *((*inicial, nivel) for nivel in app_v4.NIVELES_MAPA),
+        *((s, inicio, fin, app_v4.NIVEL_MAPA_INICIAL) for s in subtipos for inicio, fin in periodos_estandar(cubo))
+    ]))
+
+    # Las entradas de versiones de datos anteriores las borra el propio cache al escribir la primera nueva
+    inicio = time.perf_counter()
+    with ProcessPoolExecutor(max_workers = args.procesos) as pool:
+        for subtipo, desde, hasta, nivel in pool.map(_precalentar, tareas):
+            print(f"  {subtipo} {desde} a {hasta} ({nivel})", flush = True)
+    segundos = time.perf_counter() - inicio
+
+    archivos = list(CACHE_MAPAS_DIR.glob(f"{cubo.version or '_'}/*.pkl"))
+    tamano = sum(a.stat().st_size for a in archivos)
+    print(f"{len(tareas)} mapas ({len(subtipos)} subtipos, último mes publicado {cubo.ultimo_mes:%Y-%m}) "
+          f"en {segundos:.1f} s: {segundos / max(len(tareas), 1):.2f} s por mapa")
+    print(f"Cache en disco: {len(archivos)} archivos, {tamano / 2**20:.1f} MB en {CACHE_MAPAS_DIR}")
@@ -1,22 +1,24 @@
 import geopandas as gpd
-from pathlib import Path
+import pandas as pd
+from geometrias import (SHAPEFILE_PATH, GEOMETRIAS_DIR, NIVELES, ordenar_por_catalogo, simplificar_nivel,
+                        disolver_estados, ruta_nivel, ruta_estados, reporte_nivel)
+from catalogo import actualizar_catalogo
 
-# --- Rutas ---
-BASE_DIR = Path(__file__).resolve().parent.parent
-shapefile_path = BASE_DIR / "01_datos/raw/mg_2025_integrado/conjunto_de_datos/00mun.shp"
-output_path = BASE_DIR / "01_datos/processed/00mun_simplificado.geojson"
+# --- Cargar shapefile, en orden de catálogo (id_municipio) ---
+# Municipios del marco geoestadístico sin registros en el SESNSP reciben su código aquí
+gdf = gpd.read_file(SHAPEFILE_PATH)
+actualizar_catalogo(municipios=gdf['CVEGEO'])
+gdf = ordenar_por_catalogo(gdf)
+GEOMETRIAS_DIR.mkdir(parents=True, exist_ok=True)
 
-# --- Cargar shapefile ---
-gdf = gpd.read_file(shapefile_path)
+# --- Simplificar por arcos compartidos y guardar cada nivel ---
+reportes = []
+for nivel in NIVELES:
+    gdf_simpl = simplificar_nivel(gdf, nivel)
+    gdf_simpl.to_parquet(ruta_nivel(nivel))
+    # Entidades disueltas del mismo nivel (capa "Entidades" del selector de nivel del dashboard)
+    disolver_estados(gdf_simpl).to_parquet(ruta_estados(nivel))
+    reportes.append(reporte_nivel(nivel, gdf_simpl))
 
-# --- Convertir a CRS métrico para simplificar ---
-gdf_m = gdf.to_crs(epsg=3857)  # metros
-
-# --- Simplificar geometrías ---
-gdf_m["geometry"] = gdf_m.geometry.simplify(tolerance=600, preserve_topology=True)
-
-# --- Volver a CRS lat/lon (EPSG:4326) ---
-gdf_simpl = gdf_m.to_crs(epsg=4326)
-
-# --- Guardar simplificado ---
-gdf_simpl.to_file(output_path, driver="GeoJSON")
\ No newline at end of file
+# --- Reporte de vértices y tamaño por nivel ---
+print(pd.DataFrame(reportes).to_string(index=False))
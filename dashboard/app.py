@@ -1,47 +1,27 @@
-from pathlib import Path
 import streamlit as st
-import pandas as pd
-import geopandas as gpd
 import plotly.express as px
+from datos import obtener_cubo, obtener_geometrias, valores_en_geometria
 
-BASE_DIR = Path(__file__).resolve().parent.parent
-
-def cargar_datos():
-    ## Cargar df de incidencia municipal procesado y el shapefile municipal ##
-    df = pd.read_parquet(BASE_DIR / "01_datos/processed/Municipal-Delitos.parquet")
-    gdf = gpd.read_file(BASE_DIR /"01_datos/raw/mg_2025_integrado/conjunto_de_datos/00mun.shp")
-    gdf = gdf.to_crs(epsg=4326)
-    return df, gdf
-
-df, gdf = cargar_datos()
-
-gdf["geometry"] = gdf.geometry.simplify(tolerance=0.01, preserve_topology=True)
+## Cubo y geometría quedan en memoria entre reruns de streamlit (ver datos.py) ##
+cubo = obtener_cubo()
+gdf = obtener_geometrias('nacional')
 
 
 ## Sidebar de filtros ##
-subtipos = df['subtipo_de_delito'].cat.categories.tolist()
+subtipos = sorted(cubo.subtipos)
 selected_subtipo = st.sidebar.selectbox("Subtipo de delito", subtipos)
 
 rango_fechas = st.sidebar.date_input(
     "Rango de fechas",
-    [df['fecha'].min(), df['fecha'].max()]
+    [cubo.fechas[0], cubo.fechas[-1]]
 )
 
-## Filtrar datos ##
-
-df_filtrado = df[
-    (df["subtipo_de_delito"] == selected_subtipo) & 
-    (df["fecha"] >= pd.to_datetime(rango_fechas[0])) &
-    (df["fecha"] <= pd.to_datetime(rango_fechas[1])) 
-]
-
-## Agregar totales por municipio ##
-df_agrupado = df_filtrado.groupby('cve_municipio')['total'].sum().reset_index()
+## Totales por municipio desde el cubo acumulado ##
+totales = cubo.totales(selected_subtipo, rango_fechas[0], rango_fechas[1])
 
 
-## Unir a geometría municipal ##
-gdf = gdf.rename(columns={'CVEGEO':'cve_municipio'})
-gdf_mapa = gdf.merge(df_agrupado, on = 'cve_municipio', how = 'left').fillna(0)
+## Unir a geometría municipal (por posición de id_municipio) ##
+gdf_mapa = gdf.assign(total = valores_en_geometria(totales, gdf))
 
 
 ## Mapa interactivo ##
@@ -1,52 +1,49 @@
 import streamlit as st
 import pandas as pd
-import geopandas as gpd
 import folium
 from streamlit.components.v1 import html
-from pathlib import Path
-import branca.colormap as cm
+from datos import obtener_cubo, obtener_geometrias, valores_en_geometria
+from cache import CacheLRU, CACHE_DIR, clave_consulta
+from escalas_color import CORTES_ROJOS, colores, escala_lineal, opacidad_escalonada
 
 
-BASE_DIR = Path(__file__).resolve().parent.parent
 st.set_page_config(layout="wide", initial_sidebar_state="expanded")
 
-def cargar_datos():
-    ## Cargar df de incidencia municipal procesado y el shapefile municipal ##
-    df = pd.read_parquet(BASE_DIR / "01_datos/processed/Municipal-Delitos.parquet")
-    gdf = gpd.read_file(BASE_DIR /"01_datos/processed/00mun_simplificado.geojson")
-    gdf = gdf.rename(columns={'CVEGEO':'cve_municipio'})
-    return df, gdf
-
-df, gdf = cargar_datos()
+## Cubo y geometría quedan en memoria entre reruns de streamlit (ver datos.py) ##
+cubo = obtener_cubo()
+gdf = obtener_geometrias('estatal')
 
 @st.cache_resource
+def cache_mapas():
+    ## Una sola instancia del cache compartido para todas las sesiones ##
+    return CacheLRU(max_elementos=32, max_bytes=256 * 2**20, directorio=CACHE_DIR / "mapas_folium")
+
+def mapa_cacheado(subtipo, fecha_inicio, fecha_fin):
+    ## HTML del mapa y total, cacheados por mes de inicio y fin ##
+    clave = clave_consulta(subtipo, fecha_inicio, fecha_fin, cubo.version)
+    def calcular():
+        m, total = crear_mapa(subtipo, fecha_inicio, fecha_fin)
+        return m._repr_html_(), total
+    return cache_mapas().obtener(clave, calcular)
+
 def crear_mapa(subtipo, fecha_inicio, fecha_fin):
-    ## Filtrar datos ##
-    df_filtrado = df[
-        (df["subtipo_de_delito"] == subtipo) & 
-        (df["fecha"] >= pd.to_datetime(fecha_inicio)) &
-        (df["fecha"] <= pd.to_datetime(fecha_fin)) 
-    ]
-    
-    ## Agregar totales por municipio ##
-    df_agrupado = df_filtrado.groupby('cve_municipio', observed=False)['total'].sum().reset_index()
+    ## Totales por municipio desde el cubo acumulado ##
+    totales = cubo.totales(subtipo, fecha_inicio, fecha_fin)
     
-    ## Unir a geometría municipal ##
-    gdf_mapa = gdf.merge(df_agrupado, on='cve_municipio', how='left').fillna(0)
+    ## Unir a geometría municipal (por posición de id_municipio) ##
+    gdf_mapa = gdf.assign(total=valores_en_geometria(totales, gdf))
     
-    ## Paleta dinámica de color ##
+    ## Color y opacidad de todos los municipios en una sola pasada ##
     vmin = gdf_mapa["total"].min()
     vmax = gdf_mapa["total"].max()
-    indices = [vmin, vmax*0.1, vmax*0.3, vmax*0.55, vmax*0.8, vmax]
-    colores = ["#000000", "#683737", "#6D0505", "#990000", "#cc0000", "#ff0000"]
-    
-    colormap = cm.LinearColormap(
-        colors=colores,
-        index=indices,
-        vmin=vmin,
-        vmax=vmax
-    )
-    colormap.caption = "Total"
+    cortes = [vmin] + [vmax * f for f in CORTES_ROJOS[1:]]
+    fill = colores(escala_lineal(gdf_mapa["total"], cortes))
+    opacidad = opacidad_escalonada(gdf_mapa["total"], vmax)
+    # Un estilo por municipio, en el orden de las filas; el id de cada feature es su posición
+    estilos = [
+        {"fillColor": f, "color": "grey50", "weight": 0.3, "fillOpacity": o}
+        for f, o in zip(fill, opacidad)
+    ]
     
     ## Mapa interactivo ##
     gdf_proj = gdf_mapa.to_crs("EPSG:3857")
@@ -59,19 +56,10 @@ def crear_mapa(subtipo, fecha_inicio, fecha_fin):
     )
     
     folium.GeoJson(
-        gdf_mapa,
-        style_function=lambda x: {
-            "fillColor": colormap(x['properties']['total']),
-            "color": "grey50",
-            "weight": 0.3,
-            "fillOpacity": (
-                0.55 if x['properties']['total'] <= vmax*0.55 else
-                0.7 if x['properties']['total'] <= vmax*0.6 else
-                0.85 if x['properties']['total'] <= vmax*0.7 else
-                0.95 if x['properties']['total'] <= vmax*0.9 else
-                1.0
-            ),
-        },
+        # Solo viajan las propiedades del tooltip; el estilo no va en cada feature
+        gdf_mapa[["NOMGEO", "total", "geometry"]].reset_index(drop=True),
+        # style_function ya no calcula nada: busca el estilo precalculado por posición
+        style_function=lambda x: estilos[int(x['id'])],
         highlight_function=lambda x: {
             "color": "#ffe066",  # amarillo claro
             "weight": 3,
@@ -83,10 +71,10 @@ def crear_mapa(subtipo, fecha_inicio, fecha_fin):
         )
     ).add_to(m)
     
-    return m, df_filtrado['total'].sum()
+    return m, totales.sum()
 
 ## Sidebar de filtros ##
-subtipos = df['subtipo_de_delito'].cat.categories.tolist()
+subtipos = sorted(cubo.subtipos)
 selected_subtipo = st.sidebar.selectbox(
     "Subtipo de delito", 
     subtipos,
@@ -98,7 +86,7 @@ rango_fechas = st.sidebar.date_input(
 )
 
 # --- Crear y renderizar mapa ---
-m, num_registros = crear_mapa(selected_subtipo, rango_fechas[0], rango_fechas[1])
+mapa_html, num_registros = mapa_cacheado(selected_subtipo, rango_fechas[0], rango_fechas[1])
 
 html(
     f"""
@@ -110,7 +98,7 @@ html(
         }}
     </style>
     <div style="position: fixed; top: 0; left: 0; width: 110%; height: 100vh; z-index: 1;">
-        {m._repr_html_()}
+        {mapa_html}
     </div>
     """,
     height=800
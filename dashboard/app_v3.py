@@ -1,89 +1,103 @@
-from dash import Dash, dcc, html, Input, Output, State
+from dash import Dash, dcc, html, Input, Output, State, ClientsideFunction
 import plotly.express as px
 import plotly.graph_objects as go
 import pandas as pd
-import geopandas as gpd
-from pathlib import Path
-
-
-BASE_DIR = Path(__file__).resolve().parent.parent
-
-def cargar_datos():
-    ## Cargar df de incidencia municipal procesado y el shapefile municipal ##
-    df = pd.read_parquet(BASE_DIR / "01_datos/processed/Municipal-Delitos.parquet")
-    gdf = gpd.read_file(BASE_DIR /"01_datos/processed/00mun_simplificado.geojson")
-    gdf = gdf.rename(columns={'CVEGEO':'cve_municipio'})
-    return df, gdf
-
-df, gdf = cargar_datos()
-
-print(df.head(10))
+import json
+from functools import lru_cache
+from datos import obtener_cubo, obtener_geometrias, valores_en_geometria
+from series import registrar_series, serie_municipio
+from serializacion import preparar_capa, reportar_respuesta
+
+
+# True: la geometría viaja una sola vez al navegador y los callbacks solo envían totales
+GEOMETRIA_EN_CLIENTE = True
+
+# Cubo y geometría se cargan en el primer uso (ver datos.py), no al importar
+NIVEL_GEOMETRIA = 'estatal'
+
+@lru_cache(maxsize=None)
+def geojson_municipios():
+    ## GeoJSON con solo las propiedades que usa el mapa; se serializa una sola vez ##
+    gdf = obtener_geometrias(NIVEL_GEOMETRIA)
+    geojson = preparar_capa(gdf, ['id_municipio', 'NOMGEO']).__geo_interface__
+    # La geometría no cambia entre filtros: se mide una vez por proceso
+    reportar_respuesta('geometria_cliente', json.dumps(geojson))
+    return geojson
+
+@lru_cache(maxsize=None)
+def capa_servidor():
+    ## Modo servidor: atributos por municipio y GeoJSON de la figura (solo geometría e id), preparados una vez ##
+    capa = preparar_capa(obtener_geometrias(NIVEL_GEOMETRIA), ['id_municipio', 'cve_municipio', 'NOMGEO'])
+    geojson = capa[['cve_municipio', capa.geometry.name]].set_index('cve_municipio').__geo_interface__
+    reportar_respuesta('geometria_servidor', json.dumps(geojson))
+    return pd.DataFrame(capa.drop(columns=capa.geometry.name)), geojson
+
+def valores_por_municipio(totales):
+    ## Totales alineados al orden de las features del GeoJSON ##
+    gdf = obtener_geometrias(NIVEL_GEOMETRIA)
+    return valores_en_geometria(totales, gdf).tolist()
 
 ## Inicializacion de app ##
-app = Dash(__name__, suppress_callback_exceptions=True)
+# compress=True: respuestas con gzip/brotli (flask-compress)
+app = Dash(__name__, suppress_callback_exceptions=True, compress=True)
 server = app.server
 
-app.layout = html.Div([
-    html.Div([
-        ## Dropdown subtipo ##
-        dcc.Dropdown(
-            id='dropdown_subtipo',
-            options=[{'label': s, 'value': s} for s in df['subtipo_de_delito'].cat.categories],
-            value='Homicidio doloso'
-        ),
-        ### Selector de fecha ##
-        dcc.DatePickerRange(
-            id='rango_fechas',
-            start_date=pd.to_datetime("2024-01-01"),
-            end_date=pd.to_datetime("2024-12-31")
-        ),
-    ], style={'width':'20%', 'display':'inline-block', 'verticalAlign':'top', 'padding':'10px'}),
+## Serie mensual por municipio (drill-down): /series/<cve_municipio>?subtipo=... ##
+registrar_series(server)
+
+def construir_layout():
+    ## Layout evaluado al servir la página, no al importar ##
+    return html.Div([
+        html.Div([
+            ## Dropdown subtipo ##
+            dcc.Dropdown(
+                id='dropdown_subtipo',
+                options=[{'label': s, 'value': s} for s in sorted(obtener_cubo().subtipos)],
+                value='Homicidio doloso'
+            ),
+            ### Selector de fecha ##
+            dcc.DatePickerRange(
+                id='rango_fechas',
+                start_date=pd.to_datetime("2024-01-01"),
+                end_date=pd.to_datetime("2024-12-31")
+            ),
+        ], style={'width':'20%', 'display':'inline-block', 'verticalAlign':'top', 'padding':'10px'}),
     
-    html.Div([
-        ## Placeholder mapa ##
-        dcc.Graph(id='mapa', style={'height': '900px'})  # altura aumentada (1.5x de ~600px)
-    ], style={'width':'75%', 'display':'inline-block', 'padding':'10px'}),
+        html.Div([
+            ## Placeholder mapa ##
+            dcc.Graph(id='mapa', style={'height': '900px'}),  # altura aumentada (1.5x de ~600px)
+            ## Serie del municipio seleccionado con un click en el mapa ##
+            dcc.Graph(id='serie_municipio', style={'height': '320px'}),
+            ## Geometría (una vez por sesión) y valores por municipio (en cada filtro) ##
+            dcc.Store(id='geometria_municipios', data=geojson_municipios() if GEOMETRIA_EN_CLIENTE else None),
+            dcc.Store(id='valores_municipio')
+        ], style={'width':'75%', 'display':'inline-block', 'padding':'10px'}),
     
-    html.Div(id='resumen', style={'padding':'10px'})
-])
+        html.Div(id='resumen', style={'padding':'10px'})
+    ])
+
+app.layout = construir_layout
 
 ## Definimos los callbacks ##
-@app.callback(
-    Output('mapa', 'figure'),
-    Output('resumen', 'children'),
-    Input('dropdown_subtipo', 'value'),
-    Input('rango_fechas', 'start_date'),
-    Input('rango_fechas', 'end_date')
-)
+def actualizar_valores_y_resumen(subtipo, start_date, end_date):
+    ## Solo envía los totales en orden de id_municipio; el navegador los une a la geometría ##
+    totales = obtener_cubo().totales(subtipo, start_date, end_date)
+    resumen = f"{totales.sum():,} casos de {subtipo} en el periodo seleccionado."
+    return {'total': valores_por_municipio(totales)}, resumen
 
 def actualizar_mapa_y_resumen(subtipo, start_date, end_date):
 
-    ## Filtramos DF de incidencia ##
-    df_filtrado = df[
-        (df['subtipo_de_delito'] == subtipo) &
-        (df['fecha'] >= pd.to_datetime(start_date)) &
-        (df['fecha'] <= pd.to_datetime(end_date))
-    ]
-
-    ## Agregamos totales por municipio
-    df_agrupado = (
-        df_filtrado
-        .groupby('cve_municipio', observed = False)['total']
-        .sum()
-        .reset_index()
-    )
+    ## Totales por municipio desde el cubo acumulado ##
+    totales = obtener_cubo().totales(subtipo, start_date, end_date)
 
-    ## Unimos a geometria ##
-    gdf_mapa = gdf.merge(
-        df_agrupado,
-        on = 'cve_municipio',
-        how="left"
-    ).fillna(0)
+    ## Unimos a los atributos (por posición de id_municipio); la geometría ya está preparada ##
+    atributos, geojson = capa_servidor()
+    df_mapa = atributos.assign(total=valores_en_geometria(totales, atributos))
 
     ## Creamos fig plotly ##
     fig = px.choropleth_mapbox(
-        gdf_mapa,
-        geojson=gdf_mapa.set_index('cve_municipio').__geo_interface__,  # <-- fix: index by 'cve_municipio'
+        df_mapa,
+        geojson=geojson,  # features con id = cve_municipio
         locations='cve_municipio',
         color='total',
         hover_name='NOMGEO',
@@ -95,11 +109,64 @@ def actualizar_mapa_y_resumen(subtipo, start_date, end_date):
     fig.update_traces(marker_line_width=0.5, marker_line_color="#f2f2f2")  # Opcional: contorno claro
 
     ## Resumen texto ##
-    num_registros = df_filtrado['total'].sum()
+    num_registros = totales.sum()
     resumen = f"{num_registros:,} casos de {subtipo} en el periodo seleccionado."
 
     return fig, resumen
 
+@app.callback(
+    Output('serie_municipio', 'figure'),
+    Input('mapa', 'clickData'),
+    Input('dropdown_subtipo', 'value'),
+    Input('rango_fechas', 'start_date'),
+    Input('rango_fechas', 'end_date')
+)
+def actualizar_serie(click, subtipo, start_date, end_date):
+    ## Serie mensual, media móvil de 12 meses y variación anual del municipio clickeado, en el periodo del mapa ##
+    if not click:
+        return go.Figure(layout={'template': 'plotly_dark', 'title': 'Haz click en un municipio para ver su serie'})
+
+    # En ambos modos el mapa ubica cada municipio por id_municipio o por cve_municipio
+    punto = click['points'][0]
+    cubo = obtener_cubo()
+    id_municipio = punto['location'] if GEOMETRIA_EN_CLIENTE else cubo.municipios.get_loc(punto['location'])
+    serie = serie_municipio(subtipo, int(id_municipio), start_date, end_date)
+
+    fig = go.Figure(layout={'template': 'plotly_dark'})
+    fig.add_bar(x=serie['fecha'], y=serie['total'], name='total', customdata=serie['variacion_anual'],
+                hovertemplate='%{x|%Y-%m}: %{y:,}<br>vs. año anterior: %{customdata:+.1%}<extra></extra>')
+    fig.add_scatter(x=serie['fecha'], y=serie['media_movil_12'], name='media móvil 12 meses', mode='lines')
+    fig.update_layout(
+        title=f"{punto.get('text') or punto.get('hovertext') or cubo.municipios[int(id_municipio)]}: {subtipo}",
+        margin={'t': 40, 'r': 10, 'b': 30, 'l': 40}
+    )
+    return fig
+
+if GEOMETRIA_EN_CLIENTE:
+    app.callback(
+        Output('valores_municipio', 'data'),
+        Output('resumen', 'children'),
+        Input('dropdown_subtipo', 'value'),
+        Input('rango_fechas', 'start_date'),
+        Input('rango_fechas', 'end_date')
+    )(actualizar_valores_y_resumen)
+
+    ## Une valores y geometría en el navegador (assets/mapa_cliente.js) ##
+    app.clientside_callback(
+        ClientsideFunction(namespace='incidencia', function_name='pintar_mapa'),
+        Output('mapa', 'figure'),
+        Input('valores_municipio', 'data'),
+        State('geometria_municipios', 'data')
+    )
+else:
+    app.callback(
+        Output('mapa', 'figure'),
+        Output('resumen', 'children'),
+        Input('dropdown_subtipo', 'value'),
+        Input('rango_fechas', 'start_date'),
+        Input('rango_fechas', 'end_date')
+    )(actualizar_mapa_y_resumen)
+
 
 ## Ejecución ##
 
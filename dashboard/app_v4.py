@@ -1,229 +1,421 @@
-from dash import Dash, html, dcc, Input, Output
-from keplergl import KeplerGl
+import time
+_inicio_import = time.perf_counter()
+
+from dash import Dash, DiskcacheManager, html, dcc, Input, Output, no_update
+import diskcache
 import pandas as pd
-import geopandas as gpd
-from pathlib import Path
 import warnings
 import json
-import os
-from tempfile import gettempdir
-import matplotlib.pyplot as plt
-import matplotlib
+from functools import lru_cache
+from types import MappingProxyType
+from datos import (obtener_cubo, obtener_geometrias, obtener_circulos, obtener_estados, obtener_circulos_estados,
+                   consultar_periodo, valores_en_geometria, precargar)
+from cache import CacheLRU, CACHE_DIR, CACHE_MAPAS_DIR, clave_consulta
+from escalas_color import PALETA_KEPLER, opacidad_lineal
+from teselas import registrar_teselas
+from series import registrar_series
+from espacial import caja_vista, cubre_capa, municipios_en_caja
+from metricas import (fase, medir_callback, observar_callback, contar_payload, diferir_metricas, registrar_diferidas,
+                      registrar_metricas)
+from serializacion import preparar_capa, reportar_respuesta
+from rutas import DATOS_DIR
+import arranque
 
 
 warnings.filterwarnings("ignore", category=UserWarning)
 
 
-BASE_DIR = Path(__file__).resolve().parent.parent
-
-# Variable global para almacenar el estado del mapa
-map_state = {
+# Estado inicial del mapa: plantilla inmutable, cada request arma su propia copia
+# Es también la única vista que reciben los callbacks: Kepler corre dentro del iframe y no reporta
+# su viewport a Dash. Su caja cubre todo el país, así que el recorte por caja (espacial.py) no corre
+# hasta que llegue una vista real del cliente
+MAPA_INICIAL = MappingProxyType({
     'bearing': 0,
     'dragRotate': True,
     'latitude': 23.6345,
     'longitude': -102.5528,
     'pitch': 0,
     'zoom': 4.9
-}
+})
+
+# Cubo y geometría se cargan en el primer uso (ver datos.py) o en el primer fallo del cache (preparar_renders)
+NIVEL_GEOMETRIA = 'estatal'
+
+# Vista con la que abre el dashboard (Precalentar_cache.py la deja renderizada)
+SUBTIPO_INICIAL = 'Homicidio doloso'
+PERIODO_INICIAL = ("2024-01-01", "2024-12-31")
 
-def cargar_datos():
-    ## Cargar df de incidencia municipal procesado y el shapefile municipal ##
-    df = pd.read_parquet(BASE_DIR / "01_datos/processed/Municipal-Delitos.parquet")
-    gdf = gpd.read_file(BASE_DIR /"01_datos/processed/00mun_simplificado.geojson")
-    gdf = gdf.rename(columns={'CVEGEO':'cve_municipio'})
-    return df, gdf
+# Capas del selector de nivel: ~2,470 municipios o las 32 entidades (disueltas del nivel nacional)
+NIVELES_MAPA = {'municipios': "Municipios", 'estados': "Entidades"}
+NIVEL_MAPA_INICIAL = 'municipios'
+NIVEL_ESTADOS = 'nacional'
 
-df, gdf = cargar_datos()
+# Altura de los círculos por caso; una entidad suma en promedio ~80 municipios
+ELEVACION_POR_CASO = {'municipios': 100000, 'estados': 1250}
+
+# Totales y resumen por municipio y srcDoc ya renderizados, por (versión de datos, subtipo, mes inicial, mes final)
+# El nivel en disco de los mapas lo llena Precalentar_cache.py tras cada actualización de datos
+cache_totales = CacheLRU(max_elementos=512, max_bytes=64 * 2**20)
+cache_mapas = CacheLRU(max_elementos=32, max_bytes=512 * 2**20, directorio=CACHE_MAPAS_DIR)
+
+# Renders del mapa en procesos aparte (diskcache, sin Celery ni Redis): no bloquean los workers web
+# y un render que quedó viejo (el usuario ya cambió el filtro) se termina en cuanto llega el nuevo
+# El mismo diskcache marca qué mapas se están renderizando, para no renderizar dos veces el mismo
+cache_callbacks = diskcache.Cache(str(CACHE_DIR / "callbacks"))
+manager_renders = DiskcacheManager(cache_callbacks)
+
+# Estilo del mapa; mientras corre un render se atenúa
+ESTILO_MAPA = {
+    'border': '2px solid #23272b',
+    'borderRadius': '8px',
+    'boxShadow': '0 2px 16px #000a',
+    'marginTop': '0',
+    'marginBottom': '0'
+}
 
 ## Inicialización de dash ##
-app = Dash(__name__, suppress_callback_exceptions=True)
+# compress=True: respuestas con gzip/brotli (flask-compress)
+app = Dash(__name__, suppress_callback_exceptions=True, background_callback_manager=manager_renders, compress=True)
 server = app.server
 
-app.layout = html.Div([
-    html.Div([
-        html.H2(
-            "Incidencia Municipal",
-            style={
-                'color': "#DBDBDB",
+## Métricas de los caches ##
+@server.route("/cache/metricas")
+def metricas_cache():
+    return {'totales': cache_totales.metricas(), 'mapas': cache_mapas.metricas()}
+
+## Latencia por fase, subtipo y periodo, y tamaño de respuesta (Prometheus) ##
+registrar_metricas(server)
+
+## Serie mensual por municipio (drill-down): /series/<cve_municipio>?subtipo=... ##
+registrar_series(server)
+
+## Teselas vectoriales de municipios (generadas con Generar_teselas.py) ##
+registrar_teselas(server, DATOS_DIR / "processed/00mun.mbtiles")
+
+def construir_layout():
+    ## Layout evaluado al servir la página: las opciones salen del cubo cargado en el primer uso ##
+    cubo = obtener_cubo()
+    return html.Div([
+        html.Div([
+            html.H2(
+                "Incidencia Municipal",
+                style={
+                    'color': "#DBDBDB",
+                    'fontFamily': 'Courier New, Courier, monospace',
+                    'marginBottom': '30px',
+                    'marginTop': '10px',
+                    'fontWeight': 'bold',
+                    'fontSize': '2.2rem',
+                    'letterSpacing': '1px',
+                    'textAlign': 'left'
+                }
+            ),
+            html.Label("Tipo de delito:", style={
+                'color': '#E0E0E0',
                 'fontFamily': 'Courier New, Courier, monospace',
-                'marginBottom': '30px',
-                'marginTop': '10px',
                 'fontWeight': 'bold',
-                'fontSize': '2.2rem',
-                'letterSpacing': '1px',
-                'textAlign': 'left'
-            }
-        ),
-        html.Label("Tipo de delito:", style={
-            'color': '#E0E0E0',
+                'fontSize': '1.1rem',
+                'marginBottom': '5px'
+            }),
+            dcc.Dropdown(
+                id='dropdown_subtipo',
+                options=[{'label': s, 'value': s} for s in sorted(cubo.subtipos)],
+                value=SUBTIPO_INICIAL,
+                style={
+                    'backgroundColor': "#E0E0E0",
+                    'color': "#303030",
+                    'border': 'none',
+                    'fontFamily': 'Courier New, Courier, monospace',
+                    'marginBottom': '20px'
+                }
+            ),
+            html.Label("Rango de fechas:", style={
+                'color': '#E0E0E0',
+                'fontFamily': 'Courier New, Courier, monospace',
+                'fontWeight': 'bold',
+                'fontSize': '1.1rem',
+                'marginBottom': '5px'
+            }),
+            dcc.DatePickerRange(
+                id='rango_fechas',
+                start_date=pd.to_datetime(PERIODO_INICIAL[0]),
+                end_date=pd.to_datetime(PERIODO_INICIAL[1]),
+                display_format='YYYY-MM',
+                style={
+                    'backgroundColor': '#23272b',
+                    'color': '#f8f8f2',
+                    'border': 'none',
+                    'fontFamily': 'Courier New, Courier, monospace',
+                    'marginBottom': '30px'
+                }
+            ),
+            html.Label("Nivel:", style={
+                'color': '#E0E0E0',
+                'fontFamily': 'Courier New, Courier, monospace',
+                'fontWeight': 'bold',
+                'fontSize': '1.1rem',
+                'marginBottom': '5px'
+            }),
+            dcc.RadioItems(
+                id='nivel_mapa',
+                options=[{'label': etiqueta, 'value': nivel} for nivel, etiqueta in NIVELES_MAPA.items()],
+                value=NIVEL_MAPA_INICIAL,
+                labelStyle={'display': 'block'},
+                style={
+                    'color': '#f8f8f2',
+                    'fontFamily': 'Courier New, Courier, monospace',
+                    'marginBottom': '30px'
+                }
+            ),
+            html.Div(
+                "Desarrollado por @Abel_vs con datos del SESNSP",
+                style={
+                    'color': '#888',
+                    'fontFamily': 'Courier New, Courier, monospace',
+                    'fontSize': '0.9rem',
+                    'marginTop': '670px',
+                    'textAlign': 'left'
+                }
+            )
+        ], style={
+            'width': '20%',
+            'display': 'inline-block',
+            'verticalAlign': 'top',
+            'padding': '30px 20px 10px 30px',
             'fontFamily': 'Courier New, Courier, monospace',
-            'fontWeight': 'bold',
-            'fontSize': '1.1rem',
-            'marginBottom': '5px'
+            'backgroundColor': '#23272b',
+            'color': '#f8f8f2',
+            'textAlign': 'left',
+            'height': '100vh',
+            'boxShadow': '2px 0 8px #1112',
+            'position': 'fixed',
+            'top': 0,
+            'left': 0,
+            'zIndex': 10
         }),
-        dcc.Dropdown(
-            id='dropdown_subtipo',
-            options=[{'label': s, 'value': s} for s in df['subtipo_de_delito'].cat.categories],
-            value='Homicidio doloso',
-            style={
-                'backgroundColor': "#E0E0E0",
-                'color': "#303030",
-                'border': 'none',
-                'fontFamily': 'Courier New, Courier, monospace',
-                'marginBottom': '20px'
-            }
-        ),
-        html.Label("Rango de fechas:", style={
-            'color': '#E0E0E0',
+        html.Div([
+            html.Iframe(
+                id='kepler_map',
+                srcDoc="",
+                width="96%",
+                height="980vh",
+                style=ESTILO_MAPA
+            ),
+            ## Filtros cuyo mapa no estaba en cache: dispara el render en segundo plano ##
+            dcc.Store(id='render_pendiente'),
+            ## Métricas que midió el proceso del render, para registrarlas en el worker web ##
+            dcc.Store(id='metricas_render')
+        ], style={
+            'width': '80%',
+            'display': 'inline-block',
+            'verticalAlign': 'top',
+            'padding': '10px 30px 10px 10px',
             'fontFamily': 'Courier New, Courier, monospace',
-            'fontWeight': 'bold',
-            'fontSize': '1.1rem',
-            'marginBottom': '5px'
+            'backgroundColor': '#181818',
+            'color': '#f8f8f2',
+            'textAlign': 'right',
+            'height': '100vh',
+            'marginLeft': '20%',
+            'boxSizing': 'border-box'
         }),
-        dcc.DatePickerRange(
-            id='rango_fechas',
-            start_date=pd.to_datetime("2024-01-01"),
-            end_date=pd.to_datetime("2024-12-31"),
-            display_format='YYYY-MM',
-            style={
-                'backgroundColor': '#23272b',
-                'color': '#f8f8f2',
-                'border': 'none',
-                'fontFamily': 'Courier New, Courier, monospace',
-                'marginBottom': '30px'
-            }
-        ),
         html.Div(
-            "Desarrollado por @Abel_vs con datos del SESNSP",
+            id='resumen',
             style={
-                'color': '#888',
+                'padding': '10px 30px',
                 'fontFamily': 'Courier New, Courier, monospace',
-                'fontSize': '0.9rem',
-                'marginTop': '670px',
-                'textAlign': 'left'
-            }
-        )
-    ], style={
-        'width': '20%',
-        'display': 'inline-block',
-        'verticalAlign': 'top',
-        'padding': '30px 20px 10px 30px',
-        'fontFamily': 'Courier New, Courier, monospace',
-        'backgroundColor': '#23272b',
-        'color': '#f8f8f2',
-        'textAlign': 'left',
-        'height': '100vh',
-        'boxShadow': '2px 0 8px #1112',
-        'position': 'fixed',
-        'top': 0,
-        'left': 0,
-        'zIndex': 10
-    }),
-    html.Div([
-        html.Iframe(
-            id='kepler_map',
-            srcDoc="",
-            width="96%",
-            height="980vh",
-            style={
-                'border': '2px solid #23272b',
-                'borderRadius': '8px',
-                'boxShadow': '0 2px 16px #000a',
-                'marginTop': '0',
-                'marginBottom': '0'
+                'backgroundColor': '#181818',
+                'color': "#E6E6E6",
+                'fontWeight': 'bold',
+                'fontSize': '1.1rem',
+                'position': 'fixed',
+                'bottom': 0,
+                'left': '40%',
+                'width': '80%',
+                'zIndex': 20
             }
         )
-    ], style={
-        'width': '80%',
-        'display': 'inline-block',
-        'verticalAlign': 'top',
-        'padding': '10px 30px 10px 10px',
-        'fontFamily': 'Courier New, Courier, monospace',
-        'backgroundColor': '#181818',
-        'color': '#f8f8f2',
-        'textAlign': 'right',
-        'height': '100vh',
-        'marginLeft': '20%',
-        'boxSizing': 'border-box'
-    }),
-    html.Div(
-        id='resumen',
-        style={
-            'padding': '10px 30px',
-            'fontFamily': 'Courier New, Courier, monospace',
-            'backgroundColor': '#181818',
-            'color': "#E6E6E6",
-            'fontWeight': 'bold',
-            'fontSize': '1.1rem',
-            'position': 'fixed',
-            'bottom': 0,
-            'left': '40%',
-            'width': '80%',
-            'zIndex': 20
-        }
-    )
-], style={'backgroundColor': '#181818', 'height': '100vh', 'margin': '0', 'padding': '0', 'overflow': 'hidden'})
+    ], style={'backgroundColor': '#181818', 'height': '100vh', 'margin': '0', 'padding': '0', 'overflow': 'hidden'})
+
+app.layout = construir_layout
 
 ## Callbacks ##
 @app.callback(
-    Output('kepler_map', 'srcDoc'),
     Output('resumen', 'children'),
     Input('dropdown_subtipo', 'value'),
     Input('rango_fechas', 'start_date'),
     Input('rango_fechas', 'end_date')
 )
+def actualizar_resumen(subtipo, start_date, end_date):
+    ## Respuesta inmediata: el resumen sale del cubo en milisegundos, sin esperar al mapa ##
+    return totales_periodo(subtipo, start_date, end_date)[1]
+
+@app.callback(
+    Output('kepler_map', 'srcDoc'),
+    Output('render_pendiente', 'data'),
+    Input('dropdown_subtipo', 'value'),
+    Input('rango_fechas', 'start_date'),
+    Input('rango_fechas', 'end_date'),
+    Input('nivel_mapa', 'value')
+)
+def mapa_desde_cache(subtipo, start_date, end_date, nivel):
+    ## Un mapa ya renderizado (memoria o disco) se responde aquí, sin lanzar un proceso; si falta, se pide el render ##
+    inicio = time.perf_counter()
+    en_cache = cache_mapas.get(clave_mapa(subtipo, start_date, end_date, nivel))
+    if en_cache is None:
+        # La latencia de un fallo la registra el render en segundo plano
+        preparar_renders()
+        return no_update, {'subtipo': subtipo, 'start_date': start_date, 'end_date': end_date, 'nivel': nivel}
+    observar_callback(subtipo, start_date, end_date, time.perf_counter() - inicio)
+    contar_payload(srcDoc=en_cache[0], resumen=en_cache[1])
+    return en_cache[0], no_update
+
+@app.callback(
+    Output('kepler_map', 'srcDoc', allow_duplicate=True),
+    Output('metricas_render', 'data'),
+    Input('render_pendiente', 'data'),
+    background=True,
+    running=[(Output('kepler_map', 'style'), {**ESTILO_MAPA, 'opacity': 0.4}, ESTILO_MAPA)],
+    # Si el usuario pasa a una vista en cache mientras corre un render, el render viejo no debe pisarla
+    cancel=[Input('dropdown_subtipo', 'value'), Input('rango_fechas', 'start_date'), Input('rango_fechas', 'end_date'),
+            Input('nivel_mapa', 'value')],
+    prevent_initial_call=True
+)
+def actualizar_mapa(pendiente):
+    ## Render en segundo plano; Dash cancela el trabajo anterior de la misma sesión al llegar uno nuevo ##
+    # Este proceso termina con el trabajo: sus métricas se devuelven y las registra registrar_metricas_render
+    with diferir_metricas() as diferidas:
+        src_doc = actualizar_mapa_y_resumen(**pendiente)[0]
+    return src_doc, diferidas
+
+@app.callback(
+    Input('metricas_render', 'data'),
+    prevent_initial_call=True
+)
+def registrar_metricas_render(diferidas):
+    ## Registra en el worker web las fases, latencia y tamaños que midió el render ##
+    registrar_diferidas(diferidas)
+    render = [valor for nombre, etiquetas, valor in diferidas or [] if nombre == 'fase' and etiquetas == ['render']]
+    if render:
+        arranque.marcar('primer_render', render[0])
+        arranque.reportar_una_vez()
+
+@lru_cache(maxsize=None)
+def preparar_renders():
+    ## Carga cubo, geometrías e índice, e importa keplergl, en el worker web antes del primer render ##
+    # DiskcacheManager lanza un proceso por trabajo: lo que ya esté cargado aquí lo hereda del fork en vez
+    # de cargarlo en cada render. Se hace en el primer fallo del cache, no al importar (ver arranque)
+    with arranque.medir('precarga_renders'):
+        precargar(NIVEL_GEOMETRIA)
+        import keplergl
+
+def clave_mapa(subtipo, start_date, end_date, nivel=NIVEL_MAPA_INICIAL, map_state=MAPA_INICIAL):
+    ## Clave del mapa en cache_mapas: versión de datos, subtipo, meses, nivel y vista ##
+    # La capa de entidades es la misma para cualquier vista; la municipal depende de la caja visible,
+    # salvo que la caja cubra todo el país (MAPA_INICIAL, hoy la única vista que llega del cliente)
+    caja = caja_vista(map_state)
+    if nivel == 'estados':
+        vista = 'estados'
+    elif cubre_capa(caja, NIVEL_GEOMETRIA):
+        vista = 'municipios'
+    else:
+        vista = tuple(round(v, 2) for v in caja)
+    return (*clave_consulta(subtipo, start_date, end_date, obtener_cubo().version), vista)
+
+def actualizar_mapa_y_resumen(subtipo, start_date, end_date, nivel=NIVEL_MAPA_INICIAL, map_state=MAPA_INICIAL):
+    ## Devuelve el mapa del cache si ya se renderizó el mismo subtipo, periodo, nivel y vista ##
+    # Entre procesos: dos sesiones (o Precalentar_cache.py) que piden el mismo mapa esperan un solo render
+    with medir_callback(subtipo, start_date, end_date):
+        clave = clave_mapa(subtipo, start_date, end_date, nivel, map_state)
+        src_doc, resumen = cache_mapas.obtener_entre_procesos(
+            clave, lambda: renderizar(subtipo, start_date, end_date, nivel, map_state), cache_callbacks
+        )
+    contar_payload(srcDoc=src_doc, resumen=resumen)
+    return src_doc, resumen
+
+def renderizar(subtipo, start_date, end_date, nivel=NIVEL_MAPA_INICIAL, map_state=MAPA_INICIAL):
+    ## Render completo; la fase 'render' es también el primer_render del reporte de arranque ##
+    with fase('render'):
+        return construir_mapa_y_resumen(subtipo, start_date, end_date, nivel, map_state)
+
+def totales_periodo(subtipo, start_date, end_date):
+    ## Totales por municipio y resumen, cacheados por mes ##
+    clave = clave_consulta(subtipo, start_date, end_date, obtener_cubo().version)
+    return cache_totales.obtener(clave, lambda: consultar_periodo(subtipo, start_date, end_date))
+
+def renderizar_html(mapa):
+    ## Renderiza el mapa Kepler a un string HTML en memoria, sin archivo temporal ##
+    return mapa._repr_html_().decode('utf-8')
+
+def construir_mapa_y_resumen(subtipo, start_date, end_date, nivel=NIVEL_MAPA_INICIAL, map_state=MAPA_INICIAL):
+    # keplergl es pesado: se importa en el primer render (preparar_renders lo deja cargado antes del fork)
+    from keplergl import KeplerGl
 
-def actualizar_mapa_y_resumen(subtipo, start_date, end_date):
-    start_date = pd.to_datetime(start_date)
-    end_date = pd.to_datetime(end_date)
+    ## Totales por municipio desde el cubo acumulado (filtro y agregación en una sola consulta) ##
+    with fase('totales'):
+        totales, resumen = totales_periodo(subtipo, start_date, end_date)
 
-    df_filtrado = df[
-        (df['subtipo_de_delito'] == subtipo) &
-        (df['fecha'] >= start_date) &
-        (df['fecha'] <= end_date)
-    ]
-    df_filtrado['total'] = df_filtrado['total'].astype(float)
+    if nivel == 'estados':
+        ## Entidades, con totales sumados de los mismos totales municipales ##
+        capa, nombre, campo_clave = 'estados', "Incidencia estatal", 'cve_ent'
+        with fase('union'):
+            gdf = obtener_estados(NIVEL_ESTADOS)
+            circulos = obtener_circulos_estados(NIVEL_ESTADOS)
+            por_entidad = obtener_cubo().por_entidad(totales)
+            gdf_mapa = gdf.assign(total=por_entidad[gdf['id_entidad'].to_numpy()].astype('float64'))
+    else:
+        ## Solo se serializan los municipios dentro de la vista (más un margen), vía el STRtree ##
+        # Con la vista inicial la caja cubre todo el país: ni consulta ni .iloc, la capa completa tal cual
+        capa, nombre, campo_clave = 'municipios', "Incidencia municipal", 'cve_municipio'
+        gdf = obtener_geometrias(NIVEL_GEOMETRIA)
+        circulos = obtener_circulos(NIVEL_GEOMETRIA)
+        with fase('vista'):
+            visibles = municipios_en_caja(caja_vista(map_state), NIVEL_GEOMETRIA)
+            if visibles is not None:
+                gdf, circulos = gdf.iloc[visibles], circulos.iloc[visibles]
 
-    df_agrupado = df_filtrado.groupby('cve_municipio')['total'].sum().reset_index()
-    gdf_mapa = gdf.merge(df_agrupado, on='cve_municipio', how='left').fillna(0)
-    gdf_mapa = gdf_mapa[gdf_mapa.geometry.notnull()]
+        with fase('union'):
+            gdf_mapa = gdf.assign(total=valores_en_geometria(totales, gdf).astype('float64'))
 
     # Normalizar opacidad: 
-    min_total = gdf_mapa['total'].min()
-    max_total = gdf_mapa['total'].max()
-    gdf_mapa['opacity'] = 0.6
-    if max_total > min_total:
-        mask = gdf_mapa['total'] > 0
-        gdf_mapa.loc[mask, 'opacity'] = 0.2 + 0.8 * ((gdf_mapa.loc[mask, 'total'] - min_total) / (max_total - min_total))
-    gdf_mapa.loc[gdf_mapa['total'] == 0, 'opacity'] = 0.0
+    gdf_mapa['opacity'] = opacidad_lineal(gdf_mapa['total'])
+
+    # Capa de centroides como polígonos circulares con altura (base en el centroide)
+    # Filtrar el 5% inferior de total (excluirlos)
+    with fase('circulos'):
+        total_5pct = gdf_mapa[gdf_mapa['total'] > 0]['total'].quantile(0.05)
+        mask = gdf_mapa['total'] > total_5pct
+        gdf_circles = gdf_mapa[mask].set_geometry(circulos[mask])
+        gdf_circles['elevation'] = gdf_circles['total'] * ELEVACION_POR_CASO[capa]
+        gdf_circles['opacity'] = 0.8
+
+    ## Solo viajan la clave, el nombre y los valores, con coordenadas cuantizadas (~1 m) ##
+    with fase('cuantizar'):
+        columnas = [campo_clave, *(['NOMGEO'] if 'NOMGEO' in gdf_mapa else []), 'total', 'opacity']
+        capa_mapa = preparar_capa(gdf_mapa, columnas)
+        capa_circulos = preparar_capa(gdf_circles, [campo_clave, 'total', 'elevation', 'opacity'])
 
     # Crear mapa Kepler
-    mapa = KeplerGl(height=600)
-    mapa.add_data(data=gdf_mapa, name="Incidencia municipal")
+    with fase('kepler_datos'):
+        mapa = KeplerGl(height=600)
+        mapa.add_data(data=capa_mapa, name=nombre)
+        mapa.add_data(data=capa_circulos, name="Centroides Circulares")
 
-    # Capa de centroides como polígonos circulares con altura (base en el centroide)
-    from shapely.geometry import Point
-    def make_circle(center, radius, n_points=30):
-        return Point(center).buffer(radius, resolution=n_points)
+    # Color especial para total=0 seguido de 'seismic' (paleta calculada al importar)
+    colors = PALETA_KEPLER
 
-    # Filtrar el 5% inferior de total (excluirlos)
-    total_5pct = gdf_mapa[gdf_mapa['total'] > 0]['total'].quantile(0.05)
-    gdf_circles = gdf_mapa[gdf_mapa['total'] > total_5pct].copy()
-    # Guardar centroide para usarlo como base
-    gdf_circles['centroide'] = gdf_circles['geometry'].centroid
-    gdf_circles['geometry'] = gdf_circles['centroide'].apply(lambda c: make_circle(c, 0.01))
-    gdf_circles['elevation'] = gdf_circles['total'] * 100000
-    gdf_circles['opacity'] = 0.8
-
-    mapa.add_data(data=gdf_circles.drop(columns=['centroide']), name="Centroides Circulares")
-
-    # Asignar color especial para total=0 y alfa 0.6 para todos
-    n_colors = 120
-    cmap = matplotlib.cm.get_cmap('seismic', n_colors-1)
-    paleta = [matplotlib.colors.rgb2hex(cmap(i)) for i in range(cmap.N)]
-    colors = ['#08101d'] + paleta  # Primer color para total=0
-
-    config = {
+    with fase('configuracion'):
+        mapa.config = configuracion_mapa(colors, map_state, nombre, campo_clave)
+
+    with fase('render_html'):
+        src_doc = renderizar_html(mapa)
+    # Una vez por render: los aciertos del cache envían exactamente este mismo texto
+    reportar_respuesta(f"srcDoc_{capa}", src_doc)
+
+    return src_doc, resumen
+
+def configuracion_mapa(colors, map_state=MAPA_INICIAL, nombre="Incidencia municipal", campo_clave='cve_municipio'):
+    ## Config de Kepler armada por request a partir de la vista pedida (por omisión MAPA_INICIAL) ##
+    return {
         'version': 'v1',
         'config': {
             'visState': {
@@ -233,8 +425,8 @@ def actualizar_mapa_y_resumen(subtipo, start_date, end_date):
                         'id': 'municipios_layer',
                         'type': 'geojson',
                         'config': {
-                            'dataId': 'Incidencia municipal',
-                            'label': 'Incidencia municipal',
+                            'dataId': nombre,
+                            'label': nombre,
                             'color': [255, 0, 0],
                             'columns': {'geojson': 'geometry'},
                             'isVisible': True,
@@ -299,39 +491,20 @@ def actualizar_mapa_y_resumen(subtipo, start_date, end_date):
                 'interactionConfig': {
                     'tooltip': {
                         'fieldsToShow': {
-                            'Incidencia municipal': ['cve_municipio', 'total']
+                            nombre: [campo_clave, 'total']
                         },
                         'enabled': True
                     }
                 }
             },
-            'mapState': map_state,
+            # Forzar el mapa a 3D por default 
+            'mapState': {**map_state, 'pitch': 40},
             'mapStyle': {'styleType': 'muted_night'},
             '3dBuildingColor': [9, 17, 31],  # no-op, just for clarity
         }
     }
-    # Forzar el mapa a 3D por default 
-    config['config']['mapState']['pitch'] = 40
-    mapa.config = config
 
-    # Guardar HTML en archivo temporal
-    temp_dir = gettempdir()
-    temp_file = os.path.join(temp_dir, 'kepler_map_temp.html')
-    mapa.save_to_html(file_name=temp_file)
-
-    # Leer el archivo HTML
-    with open(temp_file, 'r', encoding='utf-8') as f:
-        src_doc = f.read()
-
-    # Eliminar archivo temporal
-    try:
-        os.remove(temp_file)
-    except:
-        pass
-
-    resumen = f"{df_filtrado['total'].sum():,.0f} casos de {subtipo} en el periodo seleccionado."
-
-    return src_doc, resumen
+arranque.marcar('import', time.perf_counter() - _inicio_import)
 
 ## Ejecucion ##
 if __name__ == "__main__":
@@ -0,0 +1,34 @@
+import time
+from contextlib import contextmanager
+
+# Duración de cada fase del arranque; solo se guarda la primera vez que ocurre
+_tiempos = {}
+_reportado = False
+
+
+def marcar(fase, segundos):
+    _tiempos.setdefault(fase, segundos)
+
+
+@contextmanager
+def medir(fase):
+    ## Mide un bloque y lo registra como fase del arranque ##
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        marcar(fase, time.perf_counter() - inicio)
+
+
+def reporte():
+    ## Tabla legible con las fases del arranque ##
+    lineas = [f"  {fase:<22}{segundos * 1000:>10.1f} ms" for fase, segundos in _tiempos.items()]
+    return "Tiempos de arranque:\n" + "\n".join(lineas)
+
+
+def reportar_una_vez():
+    ## Imprime el reporte tras el primer render de cada proceso ##
+    global _reportado
+    if not _reportado:
+        _reportado = True
+        print(reporte(), flush=True)
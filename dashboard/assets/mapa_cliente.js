@@ -0,0 +1,37 @@
+// Arma la figura del mapa en el navegador: la geometría llega una sola vez
+// (dcc.Store 'geometria_municipios') y en cada filtro solo viajan los totales.
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    incidencia: {
+        pintar_mapa: function(valores, geometria) {
+            if (!valores || !geometria) {
+                return window.dash_clientside.no_update;
+            }
+
+            // Claves y nombres se extraen una vez y quedan guardados en la geometría
+            if (!geometria._claves) {
+                geometria._claves = geometria.features.map(f => f.properties.id_municipio);
+                geometria._nombres = geometria.features.map(f => f.properties.NOMGEO);
+            }
+
+            return {
+                data: [{
+                    type: 'choroplethmapbox',
+                    geojson: geometria,
+                    featureidkey: 'properties.id_municipio',
+                    locations: geometria._claves,
+                    z: valores.total,
+                    text: geometria._nombres,
+                    hovertemplate: '<b>%{text}</b><br>total=%{z}<extra></extra>',
+                    colorscale: 'Plasma',
+                    colorbar: {title: {text: 'total'}},
+                    marker: {line: {width: 0.5, color: '#f2f2f2'}}
+                }],
+                layout: {
+                    mapbox: {style: 'carto-darkmatter', center: {lat: 23, lon: -102}, zoom: 5},
+                    margin: {t: 0, r: 0, b: 0, l: 0},
+                    uirevision: 'mapa'
+                }
+            };
+        }
+    }
+});
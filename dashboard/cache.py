@@ -0,0 +1,225 @@
+import hashlib
+import os
+import pickle
+import shutil
+import time
+import pandas as pd
+from collections import OrderedDict
+from pathlib import Path
+from threading import Event, Lock
+from rutas import DATOS_DIR
+
+CACHE_DIR = DATOS_DIR / "cache"
+CACHE_MAPAS_DIR = CACHE_DIR / "mapas"
+
+
+def clave_consulta(subtipo, fecha_inicio, fecha_fin, version=''):
+    ## Clave normalizada a meses: dos fechas del mismo mes dan la misma clave ##
+    return (
+        version,
+        subtipo,
+        pd.Timestamp(fecha_inicio).strftime('%Y-%m'),
+        pd.Timestamp(fecha_fin).strftime('%Y-%m')
+    )
+
+
+class CacheLRU:
+    ## Cache acotado (elementos y bytes) con desalojo LRU, nivel opcional en disco ##
+    ## y coalescencia: peticiones iguales simultáneas calculan una sola vez ##
+
+    def __init__(self, max_elementos=64, max_bytes=None, directorio=None, max_bytes_disco=None):
+        self.max_elementos = max_elementos
+        self.max_bytes = max_bytes
+        self.directorio = Path(directorio) if directorio is not None else None
+        # Por omisión el disco tiene la misma cota en bytes que la memoria
+        self.max_bytes_disco = max_bytes if max_bytes_disco is None else max_bytes_disco
+        if self.directorio is not None:
+            self.directorio.mkdir(parents=True, exist_ok=True)
+
+        self.aciertos = 0
+        self.aciertos_disco = 0
+        self.fallos = 0
+        self.desalojos = 0
+        self.desalojos_disco = 0
+        self.coalescidos = 0
+        self.bytes = 0
+
+        self._datos = OrderedDict()
+        self._tamanos = {}
+        self._en_curso = {}
+        self._lock = Lock()
+
+    def _ruta(self, clave):
+        ## Archivo de la clave, en una carpeta por versión de datos (el primer elemento de clave_consulta) ##
+        version = clave[0] if isinstance(clave, tuple) and clave else ''
+        return self.directorio / (str(version) or '_') / (hashlib.sha1(repr(clave).encode('utf-8')).hexdigest() + ".pkl")
+
+    def _podar_versiones(self, vigente):
+        ## Borra las carpetas de versiones de datos anteriores a la vigente: sus claves ya nunca se piden ##
+        # Las versiones son sellos %Y%m%d%H%M%S y se ordenan como texto. Solo se borra hacia atrás: un worker
+        # que todavía no reabrió el cubo escribe en la versión vieja y no debe borrar la nueva ('_' = sin versión)
+        for ruta in self.directorio.iterdir():
+            if ruta == vigente:
+                continue
+            if not ruta.is_dir():
+                ruta.unlink(missing_ok=True)
+            elif ruta.name == '_' or (vigente.name != '_' and ruta.name < vigente.name):
+                shutil.rmtree(ruta, ignore_errors=True)
+
+    def _acotar_disco(self):
+        ## Borra los archivos usados hace más tiempo (mtime) hasta quedar bajo max_bytes_disco ##
+        if self.max_bytes_disco is None:
+            return
+        archivos = []
+        for ruta in self.directorio.glob("*/*.pkl"):
+            try:
+                estado = ruta.stat()
+            except FileNotFoundError:
+                continue
+            archivos.append((estado.st_mtime, estado.st_size, ruta))
+        total = sum(tamano for _, tamano, _ in archivos)
+        archivos.sort()
+        # Como en memoria, el más reciente se conserva aunque rebase la cota por sí solo
+        for _, tamano, ruta in archivos[:-1]:
+            if total <= self.max_bytes_disco:
+                break
+            ruta.unlink(missing_ok=True)
+            total -= tamano
+            with self._lock:
+                self.desalojos_disco += 1
+
+    def _guardar_memoria(self, clave, valor, tamano):
+        ## Inserta en memoria y desaloja lo menos usado; requiere el lock ##
+        if clave in self._datos:
+            self.bytes -= self._tamanos.pop(clave)
+        self._datos[clave] = valor
+        self._tamanos[clave] = tamano
+        self.bytes += tamano
+        while len(self._datos) > 1 and (
+            len(self._datos) > self.max_elementos
+            or (self.max_bytes is not None and self.bytes > self.max_bytes)
+        ):
+            viejo, _ = self._datos.popitem(last=False)
+            self.bytes -= self._tamanos.pop(viejo)
+            self.desalojos += 1
+
+    def get(self, clave):
+        with self._lock:
+            if clave in self._datos:
+                self._datos.move_to_end(clave)
+                self.aciertos += 1
+                return self._datos[clave]
+
+        # Nivel en disco: sobrevive reinicios y se comparte entre workers
+        if self.directorio is not None:
+            ruta = self._ruta(clave)
+            try:
+                datos = ruta.read_bytes()
+                # El mtime marca el último uso: es el orden de desalojo en disco
+                os.utime(ruta)
+            except FileNotFoundError:
+                datos = None
+            if datos is not None:
+                valor = pickle.loads(datos)
+                with self._lock:
+                    self.aciertos_disco += 1
+                    self._guardar_memoria(clave, valor, len(datos))
+                return valor
+
+        with self._lock:
+            self.fallos += 1
+        return None
+
+    def put(self, clave, valor):
+        datos = pickle.dumps(valor, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._guardar_memoria(clave, valor, len(datos))
+        if self.directorio is not None:
+            ruta = self._ruta(clave)
+            version_nueva = not ruta.parent.exists()
+            try:
+                ruta.parent.mkdir(parents=True, exist_ok=True)
+                temporal = ruta.with_suffix(f".{os.getpid()}.tmp")
+                temporal.write_bytes(datos)
+                temporal.replace(ruta)
+            except FileNotFoundError:
+                # Otro proceso podó la carpeta mientras se escribía; el valor sigue en memoria
+                return
+            if version_nueva:
+                self._podar_versiones(ruta.parent)
+            self._acotar_disco()
+
+    def obtener(self, clave, calcular):
+        ## Devuelve el valor cacheado o lo calcula; los demás hilos con la misma clave esperan ##
+        valor = self.get(clave)
+        if valor is not None:
+            return valor
+
+        with self._lock:
+            evento = self._en_curso.get(clave)
+            lider = evento is None
+            if lider:
+                evento = self._en_curso[clave] = Event()
+
+        if not lider:
+            evento.wait()
+            with self._lock:
+                self.coalescidos += 1
+                if clave in self._datos:
+                    return self._datos[clave]
+            # El cálculo del líder falló: se intenta de nuevo en este hilo
+            return calcular()
+
+        try:
+            valor = calcular()
+            self.put(clave, valor)
+            return valor
+        finally:
+            with self._lock:
+                del self._en_curso[clave]
+            evento.set()
+
+    def obtener_entre_procesos(self, clave, calcular, registro, espera=0.05, expira=600):
+        ## Como obtener, pero la coalescencia abarca procesos: cada clave la calcula un solo proceso ##
+        # registro es un diskcache.Cache compartido; la marca de la clave guarda el pid de quien calcula y
+        # los demás esperan a que la suelte para leer el resultado del nivel en disco. Si ese proceso murió
+        # (un render cancelado) se toma la marca; expira acota el caso en que no se pueda saber
+        marca = ('calculando', str(self.directorio), repr(clave))
+        while True:
+            if registro.add(marca, os.getpid(), expire=expira):
+                try:
+                    return self.obtener(clave, calcular)
+                finally:
+                    registro.delete(marca)
+            pid = registro.get(marca)
+            if pid is not None and not _proceso_vivo(pid):
+                with registro.transact():
+                    if registro.get(marca) == pid:
+                        registro.delete(marca)
+                continue
+            time.sleep(espera)
+
+    def __len__(self):
+        return len(self._datos)
+
+    def metricas(self):
+        ## Resumen de uso del cache ##
+        return {
+            'elementos': len(self._datos),
+            'bytes': self.bytes,
+            'aciertos': self.aciertos,
+            'aciertos_disco': self.aciertos_disco,
+            'fallos': self.fallos,
+            'desalojos': self.desalojos,
+            'desalojos_disco': self.desalojos_disco,
+            'coalescidos': self.coalescidos
+        }
+
+
+def _proceso_vivo(pid):
+    ## psutil ya lo requiere DiskcacheManager; os.kill(pid, 0) terminaría el proceso en Windows ##
+    import psutil
+    try:
+        return psutil.Process(pid).status() != psutil.STATUS_ZOMBIE
+    except psutil.NoSuchProcess:
+        return False
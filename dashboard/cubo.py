@@ -0,0 +1,64 @@
+import json
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from rutas import DATOS_DIR
+
+CUBO_DIR = DATOS_DIR / "processed/Municipal-Delitos-cubo"
+
+
+class CuboIncidencia:
+    ## Consultas de totales por municipio sobre el cubo acumulado (subtipo, municipio, mes) ##
+
+    def __init__(self, directorio=CUBO_DIR):
+        directorio = Path(directorio)
+        with open(directorio / "indices.json", encoding="utf-8") as f:
+            indices = json.load(f)
+
+        self.version = indices.get('version', '')
+        self.subtipos = indices['subtipos']
+        # Ejes en orden de catálogo: la posición de cada clave es su código (id_municipio, id_subtipo)
+        self.municipios = pd.Index(indices['municipios'], name='cve_municipio')
+        self.fechas = pd.date_range(indices['fecha_inicio'], periods=indices['n_meses'], freq='MS')
+        # Último mes publicado; los posteriores del mismo año están en el cubo como ceros
+        # (un cubo anterior a este campo se toma como completo)
+        self.ultimo_mes = pd.Timestamp(indices.get('ultimo_mes', self.fechas[-1]))
+        self.n_publicados = self.fechas.get_loc(self.ultimo_mes) + 1
+        self._pos_subtipo = {s: i for i, s in enumerate(self.subtipos)}
+        # Entidad de cada municipio: los dos primeros dígitos de la clave INEGI
+        self.id_entidad = np.array([int(c[:2]) for c in self.municipios], dtype='int64')
+
+        # mmap: solo se leen del disco las rebanadas consultadas
+        self.acumulado = np.load(directorio / "acumulado.npy", mmap_mode='r')
+
+    def indices_periodo(self, fecha_inicio, fecha_fin):
+        ## Convierte un rango de fechas a índices de mes [i0, i1), a granularidad mensual ##
+        base = self.fechas[0].year * 12 + self.fechas[0].month
+        inicio = pd.Timestamp(fecha_inicio)
+        fin = pd.Timestamp(fecha_fin)
+        n = len(self.fechas)
+        i0 = min(max(inicio.year * 12 + inicio.month - base, 0), n)
+        i1 = min(max(fin.year * 12 + fin.month - base + 1, 0), n)
+        return i0, max(i0, i1)
+
+    def totales(self, subtipo, fecha_inicio, fecha_fin):
+        ## Total por municipio de un subtipo en el periodo: dos rebanadas y una resta ##
+        i0, i1 = self.indices_periodo(fecha_inicio, fecha_fin)
+        s = self._pos_subtipo.get(subtipo)
+        if s is None:
+            valores = np.zeros(len(self.municipios), dtype='int64')
+        else:
+            valores = self.acumulado[s, :, i1].astype('int64') - self.acumulado[s, :, i0]
+        return pd.Series(valores, index=self.municipios, name='total')
+
+    def serie(self, subtipo, id_municipio):
+        ## Serie mensual de un municipio: diferencias de una sola rebanada contigua del acumulado ##
+        # Costo constante: no depende del número de municipios, subtipos ni filas del dataset
+        s = self._pos_subtipo.get(subtipo)
+        if s is None or not 0 <= id_municipio < len(self.municipios):
+            return np.zeros(len(self.fechas), dtype='int64')
+        return np.diff(self.acumulado[s, id_municipio, :].astype('int64'))
+
+    def por_entidad(self, totales):
+        ## Suma por entidad de totales por municipio; posición = clave de entidad (1 a 32) ##
+        return np.bincount(self.id_entidad, weights=np.asarray(totales), minlength=33).astype('int64')
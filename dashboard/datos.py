@@ -0,0 +1,142 @@
+import os
+import threading
+import numpy as np
+import pandas as pd
+from functools import lru_cache
+from arranque import medir
+from rutas import DATOS_DIR
+
+DATASET_DIR = DATOS_DIR / "processed/Municipal-Delitos"
+
+
+## Artefactos perezosos: se cargan en el primer uso y se comparten dentro del proceso ##
+
+_cubo_abierto = {}
+_lock_cubo = threading.Lock()
+
+
+def obtener_cubo():
+    ## Cubo acumulado, uno por proceso y por mtime de indices.json ##
+    # Abierto con mmap, así que los workers comparten páginas del sistema. guardar_cubo escribe
+    # indices.json al final: si cambió su mtime, el pipeline dejó un cubo nuevo y se reabre
+    from cubo import CuboIncidencia, CUBO_DIR
+    mtime = (CUBO_DIR / "indices.json").stat().st_mtime_ns
+    with _lock_cubo:
+        if _cubo_abierto.get('mtime') != mtime:
+            with medir('carga_cubo'):
+                _cubo_abierto.update(mtime=mtime, cubo=CuboIncidencia())
+        return _cubo_abierto['cubo']
+
+
+@lru_cache(maxsize=None)
+def _nivel_geometrias(nivel):
+    from geometrias import cargar_geometrias
+    with medir(f'carga_geometrias_{nivel}'):
+        gdf = cargar_geometrias(nivel)
+        return gdf[gdf.geometry.notnull()].reset_index(drop=True)
+
+
+@lru_cache(maxsize=None)
+def obtener_geometrias(nivel='estatal'):
+    ## Geometría municipal del nivel indicado, sin columnas auxiliares ##
+    return _nivel_geometrias(nivel).drop(columns=['centro_x', 'centro_y'])
+
+
+@lru_cache(maxsize=None)
+def obtener_circulos(nivel='estatal'):
+    ## Círculos de centroide alineados con obtener_geometrias(nivel) ##
+    from geometrias import circulos_centro
+    return circulos_centro(_nivel_geometrias(nivel))
+
+
+@lru_cache(maxsize=None)
+def _nivel_estados(nivel):
+    from geometrias import cargar_estados
+    with medir(f'carga_estados_{nivel}'):
+        return cargar_estados(nivel)
+
+
+@lru_cache(maxsize=None)
+def obtener_estados(nivel='nacional'):
+    ## Entidades (disueltas de la capa municipal y cacheadas en disco), sin columnas auxiliares ##
+    return _nivel_estados(nivel).drop(columns=['centro_x', 'centro_y'])
+
+
+@lru_cache(maxsize=None)
+def obtener_circulos_estados(nivel='nacional', radio=0.15):
+    ## Círculos de centroide alineados con obtener_estados(nivel) ##
+    from geometrias import circulos_centro
+    return circulos_centro(_nivel_estados(nivel), radio=radio)
+
+
+@lru_cache(maxsize=None)
+def obtener_indice_espacial(nivel='estatal'):
+    ## STRtree sobre la geometría del nivel; sus posiciones son las filas de obtener_geometrias(nivel) ##
+    # Se arma una vez por proceso (milisegundos); no se puede guardar dentro del GeoParquet
+    import shapely
+    with medir(f'indice_espacial_{nivel}'):
+        return shapely.STRtree(np.asarray(_nivel_geometrias(nivel).geometry.array))
+
+
+@lru_cache(maxsize=None)
+def obtener_catalogo():
+    ## Códigos enteros de municipio y subtipo (ver catalogo.py) ##
+    from catalogo import cargar_catalogo
+    return cargar_catalogo()
+
+
+def consultar_periodo(subtipo, fecha_inicio, fecha_fin):
+    ## Totales por municipio y texto de resumen de un subtipo en un periodo ##
+    totales = obtener_cubo().totales(subtipo, fecha_inicio, fecha_fin)
+    return totales, f"{totales.sum():,.0f} casos de {subtipo} en el periodo seleccionado."
+
+
+def valores_en_geometria(valores, gdf):
+    ## Valores indexados por id_municipio, en el orden de las filas de gdf: un take posicional en vez de un merge ##
+    # Un municipio agregado al catálogo después de construir el cubo queda en 0
+    valores = np.asarray(valores)
+    ids = gdf['id_municipio'].to_numpy()
+    faltan = ids.max(initial=-1) + 1 - len(valores)
+    if faltan > 0:
+        valores = np.concatenate([valores, np.zeros(faltan, dtype=valores.dtype)])
+    return valores.take(ids)
+
+
+def precargar(nivel='estatal'):
+    ## Carga todo antes de hacer fork (gunicorn --preload) ##
+    obtener_cubo()
+    obtener_geometrias(nivel)
+    obtener_circulos(nivel)
+    obtener_indice_espacial(nivel)
+    obtener_estados()
+    obtener_circulos_estados()
+
+
+if os.environ.get("INCIDENCIA_PRECARGA"):
+    precargar()
+
+
+## Dataset de incidencia ##
+
+def filtros_incidencia(subtipo=None, fecha_inicio=None, fecha_fin=None):
+    ## Filtros en formato pyarrow, a granularidad mensual como el cubo ##
+    filtros = []
+    if subtipo is not None:
+        # El dataset está ordenado por id_subtipo: se filtra por código, no por texto
+        subtipos = obtener_catalogo()['subtipos']
+        filtros.append(('id_subtipo', '==', subtipos.index(subtipo) if subtipo in subtipos else -1))
+    if fecha_inicio is not None:
+        filtros.append(('fecha', '>=', pd.Timestamp(fecha_inicio).to_period('M').to_timestamp()))
+    if fecha_fin is not None:
+        filtros.append(('fecha', '<=', pd.Timestamp(fecha_fin)))
+    return filtros or None
+
+
+def cargar_incidencia(subtipo=None, fecha_inicio=None, fecha_fin=None, columnas=None):
+    ## Lee del dataset solo los row groups que pasan los filtros (predicate pushdown en pyarrow) ##
+    return pd.read_parquet(
+        DATASET_DIR,
+        engine='pyarrow',
+        columns=columnas,
+        filters=filtros_incidencia(subtipo, fecha_inicio, fecha_fin)
+    )
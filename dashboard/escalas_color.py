@@ -0,0 +1,78 @@
+import numpy as np
+
+## Paletas: se calculan una vez al importar el módulo ##
+
+def hex_a_rgb(colores):
+    ## Lista de colores hex a arreglo (n, 3) de enteros 0-255 ##
+    return np.array([[int(c[i:i + 2], 16) for i in (1, 3, 5)] for c in colores])
+
+
+def rgb_a_hex(rgb):
+    ## Arreglo (n, 3) de enteros 0-255 a lista de colores hex ##
+    return ['#%02x%02x%02x' % tuple(c) for c in rgb]
+
+
+def interpolar_paleta(colores, n, posiciones=None):
+    ## Remuestrea una paleta a n colores interpolando linealmente en RGB ##
+    rgb = hex_a_rgb(colores)
+    if posiciones is None:
+        posiciones = np.linspace(0, 1, len(colores))
+    t = np.linspace(0, 1, n)
+    canales = [np.interp(t, posiciones, rgb[:, c]) for c in range(3)]
+    return rgb_a_hex(np.rint(np.column_stack(canales)).astype(int))
+
+
+# 'seismic' de matplotlib (azul oscuro -> blanco -> rojo oscuro), sin importar matplotlib
+_SEISMIC = ['#00004c', '#0000ff', '#ffffff', '#ff0000', '#7f0000']
+
+# Paleta de app_v4: un color especial para total=0 y 119 niveles de 'seismic'
+COLOR_CERO = '#08101d'
+PALETA_KEPLER = (COLOR_CERO, *interpolar_paleta(_SEISMIC, 119))
+
+# Rampa negro -> rojo de app_v2, con cortes como fracción del máximo
+COLORES_ROJOS = ["#000000", "#683737", "#6D0505", "#990000", "#cc0000", "#ff0000"]
+CORTES_ROJOS = [0, 0.1, 0.3, 0.55, 0.8, 1]
+
+# Tablas de 256 colores para asignar color con un solo indexado
+_NIVELES = 256
+LUT_ROJOS = np.array(interpolar_paleta(COLORES_ROJOS, _NIVELES))
+
+
+## Escalas: devuelven la posición de cada valor en [0, 1] ##
+
+def escala_lineal(valores, cortes=None):
+    ## Lineal entre mínimo y máximo, o por tramos si se dan cortes en unidades del valor ##
+    valores = np.asarray(valores, dtype='float64')
+    if len(valores) == 0 or valores.max() <= valores.min():
+        return np.zeros_like(valores)
+    vmin, vmax = valores.min(), valores.max()
+    if cortes is None:
+        return (valores - vmin) / (vmax - vmin)
+    return np.interp(valores, cortes, np.linspace(0, 1, len(cortes)))
+
+
+def colores(t, lut=LUT_ROJOS):
+    ## Color hex por posición en [0, 1], indexando una tabla precalculada ##
+    return lut[np.rint(np.clip(t, 0, 1) * (len(lut) - 1)).astype(int)]
+
+
+## Opacidades ##
+
+def opacidad_escalonada(valores, vmax):
+    ## Escalera de opacidad de app_v2, en una sola pasada ##
+    valores = np.asarray(valores, dtype='float64')
+    return np.select(
+        [valores <= vmax * 0.55, valores <= vmax * 0.6, valores <= vmax * 0.7, valores <= vmax * 0.9],
+        [0.55, 0.7, 0.85, 0.95],
+        default=1.0
+    )
+
+
+def opacidad_lineal(valores, minimo=0.2, sin_rango=0.6):
+    ## Opacidad de app_v4: lineal de minimo a 1, y transparente donde el valor es 0 ##
+    valores = np.asarray(valores, dtype='float64')
+    opacidad = np.full_like(valores, sin_rango)
+    if len(valores) and valores.max() > valores.min():
+        vmin, vmax = valores.min(), valores.max()
+        opacidad = np.where(valores > 0, minimo + (1 - minimo) * (valores - vmin) / (vmax - vmin), opacidad)
+    return np.where(valores == 0, 0.0, opacidad)
@@ -0,0 +1,50 @@
+import math
+import numpy as np
+import shapely
+from functools import lru_cache
+from datos import obtener_geometrias, obtener_indice_espacial
+
+# Kepler (Mapbox GL) usa teselas de 512 px: a zoom z el mundo mide 512 * 2**z píxeles
+TAMANO_TESELA = 512
+
+# Tamaño supuesto del mapa en pantalla; el margen cubre pantallas mayores y la inclinación (pitch)
+VISTA_PX = (1600, 1000)
+MARGEN_VISTA = 0.25
+
+
+def caja_vista(map_state, vista_px=VISTA_PX, margen=MARGEN_VISTA):
+    ## Caja (lon_min, lat_min, lon_max, lat_max) visible para el mapState de Kepler, más un margen ##
+    escala = TAMANO_TESELA * 2 ** map_state['zoom']
+    # Centro en coordenadas Web Mercator normalizadas a [0, 1]
+    x = (map_state['longitude'] + 180) / 360
+    y = (1 - math.asinh(math.tan(math.radians(map_state['latitude']))) / math.pi) / 2
+    dx = vista_px[0] * (1 + 2 * margen) / 2 / escala
+    dy = vista_px[1] * (1 + 2 * margen) / 2 / escala
+
+    a_lat = lambda v: math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * min(max(v, 0), 1)))))
+    return (
+        max((x - dx) * 360 - 180, -180),
+        a_lat(y + dy),
+        min((x + dx) * 360 - 180, 180),
+        a_lat(y - dy)
+    )
+
+
+@lru_cache(maxsize=None)
+def extension_capa(nivel='estatal'):
+    ## Caja envolvente (lon_min, lat_min, lon_max, lat_max) de toda la capa municipal del nivel ##
+    return tuple(float(v) for v in obtener_geometrias(nivel).total_bounds)
+
+
+def cubre_capa(caja, nivel='estatal'):
+    ## True si la caja contiene la capa completa: no hay nada que recortar ##
+    x0, y0, x1, y1 = extension_capa(nivel)
+    return caja[0] <= x0 and caja[1] <= y0 and caja[2] >= x1 and caja[3] >= y1
+
+
+def municipios_en_caja(caja, nivel='estatal'):
+    ## Posiciones (en orden) de los municipios cuya caja envolvente cruza la caja dada; None si la caja cubre la capa ##
+    # Basta la prueba de cajas del árbol: un municipio de más en el borde no cambia el mapa
+    if cubre_capa(caja, nivel):
+        return None
+    return np.sort(obtener_indice_espacial(nivel).query(shapely.box(*caja)))
@@ -0,0 +1,102 @@
+import numpy as np
+import geopandas as gpd
+import shapely
+from rutas import DATOS_DIR
+from catalogo import cargar_catalogo, codificar
+
+SHAPEFILE_PATH = DATOS_DIR / "raw/mg_2025_integrado/conjunto_de_datos/00mun.shp"
+GEOMETRIAS_DIR = DATOS_DIR / "processed/geometrias"
+
+# Segmentos de los círculos de centroide (30 por cuadrante, como Point.buffer(resolution=30))
+SEGMENTOS_CIRCULO = 120
+
+# Tolerancia en metros (EPSG:3857) de cada nivel de detalle precalculado
+NIVELES = {
+    'nacional': 2000,
+    'estatal': 600,
+    'local': 100
+}
+
+
+def ordenar_por_catalogo(gdf):
+    ## Agrega id_municipio (código del catálogo) y deja las filas en orden de código ##
+    # Solo lee el catálogo: quien llama agrega antes las claves nuevas con actualizar_catalogo
+    gdf = gdf.assign(id_municipio=codificar(gdf['CVEGEO'], cargar_catalogo()['municipios']))
+    return gdf.sort_values('id_municipio', ignore_index=True)
+
+
+def simplificar_arcos(geometrias, tolerancia):
+    ## Simplifica una cobertura poligonal sobre sus arcos compartidos ##
+    # Cada frontera entre vecinos se simplifica una sola vez, así que no quedan huecos ni traslapes
+    return shapely.coverage_simplify(np.asarray(geometrias), tolerancia)
+
+
+def agregar_centros(gdf_m):
+    ## Centroides calculados en CRS métrico y guardados en lon/lat junto a la geometría ##
+    centros = gdf_m.geometry.centroid.to_crs(epsg=4326)
+    gdf_m['centro_x'] = centros.x.to_numpy()
+    gdf_m['centro_y'] = centros.y.to_numpy()
+    return gdf_m
+
+
+def simplificar_nivel(gdf, nivel):
+    ## Devuelve la capa municipal simplificada al nivel indicado, en EPSG:4326 ##
+    gdf_m = gdf.to_crs(epsg=3857)
+    gdf_m['geometry'] = simplificar_arcos(gdf_m.geometry.array, NIVELES[nivel])
+    return agregar_centros(gdf_m).to_crs(epsg=4326)
+
+
+def disolver_estados(gdf):
+    ## Entidades a partir de un nivel municipal: unión de cobertura por los dos primeros dígitos de CVEGEO ##
+    # Los municipios ya comparten arcos simplificados, así que la unión no deja astillas entre ellos
+    gdf = gdf[['CVEGEO', 'geometry']].assign(cve_ent=gdf['CVEGEO'].str[:2])
+    estados = gdf.drop(columns='CVEGEO').dissolve(by='cve_ent', method='coverage', as_index=False)
+    estados['id_entidad'] = estados['cve_ent'].astype('int32')
+    return agregar_centros(estados.to_crs(epsg=3857)).to_crs(epsg=4326)
+
+
+def ruta_nivel(nivel):
+    ## Ruta del GeoParquet de un nivel de detalle ##
+    return GEOMETRIAS_DIR / f"00mun_{nivel}.parquet"
+
+
+def ruta_estados(nivel):
+    ## Ruta del GeoParquet de entidades disueltas de un nivel ##
+    return GEOMETRIAS_DIR / f"00ent_{nivel}.parquet"
+
+
+def reporte_nivel(nivel, gdf):
+    ## Vértices y tamaño (en disco y como GeoJSON) de un nivel ya guardado ##
+    return {
+        'nivel': nivel,
+        'tolerancia_m': NIVELES[nivel],
+        'vertices': int(shapely.get_num_coordinates(np.asarray(gdf.geometry.array)).sum()),
+        'bytes_parquet': ruta_nivel(nivel).stat().st_size,
+        'bytes_geojson': len(gdf.to_json().encode('utf-8'))
+    }
+
+
+def cargar_geometrias(nivel='estatal'):
+    ## Carga un nivel precalculado sin volver a simplificar ##
+    gdf = gpd.read_parquet(ruta_nivel(nivel))
+    return gdf.rename(columns={'CVEGEO': 'cve_municipio'})
+
+
+def cargar_estados(nivel='nacional'):
+    ## Entidades del nivel indicado; se disuelven y guardan en disco la primera vez ##
+    path = ruta_estados(nivel)
+    if path.exists():
+        return gpd.read_parquet(path)
+    estados = disolver_estados(gpd.read_parquet(ruta_nivel(nivel)))
+    estados.to_parquet(path)
+    return estados
+
+
+def circulos_centro(gdf, radio=0.01, segmentos=SEGMENTOS_CIRCULO):
+    ## Polígonos circulares alrededor de cada centroide, en una sola operación vectorizada ##
+    # Una plantilla de círculo unitario se desplaza a todos los centros a la vez
+    angulos = np.linspace(0, 2 * np.pi, segmentos + 1)
+    plantilla = radio * np.column_stack([np.cos(angulos), np.sin(angulos)])
+    centros = gdf[['centro_x', 'centro_y']].to_numpy()
+    anillos = centros[:, None, :] + plantilla[None, :, :]
+    return gpd.GeoSeries(shapely.polygons(anillos), index=gdf.index, crs=gdf.crs)
@@ -0,0 +1,174 @@
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+import pandas as pd
+from flask import Response
+from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram,
+                               generate_latest, multiprocess)
+
+# Cubetas en segundos: desde un mapa servido del cache (ms) hasta un render completo de Kepler
+CUBETAS_SEGUNDOS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+# Cubetas en bytes: 16 KB a 256 MB
+CUBETAS_BYTES = tuple(2 ** k for k in range(14, 30, 2))
+
+# Tramos de duración del periodo (meses): una serie por tramo y no por cada rango de fechas
+TRAMOS_MESES = ((1, '1'), (3, '2-3'), (6, '4-6'), (12, '7-12'), (24, '13-24'), (None, '25+'))
+
+FASES = Histogram(
+    'incidencia_fase_segundos', 'Duración de cada fase del render del mapa',
+    ['fase'], buckets=CUBETAS_SEGUNDOS
+)
+CALLBACK_SUBTIPO = Histogram(
+    'incidencia_callback_segundos', 'Latencia del callback del mapa por subtipo de delito',
+    ['subtipo'], buckets=CUBETAS_SEGUNDOS
+)
+CALLBACK_PERIODO = Histogram(
+    'incidencia_callback_periodo_segundos', 'Latencia del callback del mapa por duración del periodo',
+    ['meses'], buckets=CUBETAS_SEGUNDOS
+)
+PAYLOAD = Histogram(
+    'incidencia_payload_tamano_bytes', 'Tamaño de cada salida del callback',
+    ['salida'], buckets=CUBETAS_BYTES
+)
+PAYLOAD_TOTAL = Counter(
+    'incidencia_payload_bytes', 'Bytes acumulados enviados por el callback',
+    ['salida']
+)
+RESPUESTA_BYTES = Histogram(
+    'incidencia_respuesta_bytes', 'Tamaño de cada respuesta del mapa sin comprimir y con gzip',
+    ['salida', 'codificacion'], buckets=CUBETAS_BYTES
+)
+
+# Métricas por nombre corto, para las observaciones que un render en segundo plano devuelve al worker web
+METRICAS = {
+    'fase': FASES,
+    'callback_subtipo': CALLBACK_SUBTIPO,
+    'callback_periodo': CALLBACK_PERIODO,
+    'payload': PAYLOAD,
+    'payload_total': PAYLOAD_TOTAL,
+    'respuesta': RESPUESTA_BYTES
+}
+
+# Etiquetas admitidas al registrar observaciones devueltas (pasan por el navegador); el subtipo se
+# acota aparte con etiqueta_subtipo
+FASES_MAPA = ('totales', 'vista', 'union', 'circulos', 'cuantizar', 'kepler_datos', 'configuracion',
+              'render_html', 'render')
+SALIDAS = ('srcDoc', 'resumen')
+SALIDAS_RESPUESTA = ('srcDoc_municipios', 'srcDoc_estados', 'geometria_cliente', 'geometria_servidor')
+ETIQUETAS_ADMITIDAS = {
+    'fase': (FASES_MAPA,),
+    'callback_periodo': (tuple(etiqueta for _, etiqueta in TRAMOS_MESES),),
+    'payload': (SALIDAS,),
+    'payload_total': (SALIDAS,),
+    'respuesta': (SALIDAS_RESPUESTA, ('identidad', 'gzip'))
+}
+
+# Observaciones diferidas del hilo actual (ver diferir_metricas); None: se registran al momento
+_hilo = threading.local()
+
+
+def tramo_meses(fecha_inicio, fecha_fin):
+    ## Etiqueta del tramo de duración de un periodo, contado en meses como el cubo ##
+    inicio, fin = pd.Timestamp(fecha_inicio), pd.Timestamp(fecha_fin)
+    n = (fin.year - inicio.year) * 12 + fin.month - inicio.month + 1
+    for limite, etiqueta in TRAMOS_MESES:
+        if limite is None or n <= limite:
+            return etiqueta
+
+
+def etiqueta_subtipo(subtipo):
+    ## Subtipo como etiqueta; cualquier valor fuera del cubo cae en "otro" ##
+    # El valor llega del cliente: sin esta cota cada texto distinto crearía una serie nueva en Prometheus
+    from datos import obtener_cubo
+    return subtipo if subtipo in obtener_cubo().subtipos else 'otro'
+
+
+def observar(nombre, etiquetas, valor):
+    ## Registra una observación en la métrica METRICAS[nombre], o la junta si el hilo está difiriendo ##
+    diferidas = getattr(_hilo, 'diferidas', None)
+    if diferidas is not None:
+        diferidas.append([nombre, list(etiquetas), valor])
+        return
+    metrica = METRICAS[nombre].labels(*etiquetas)
+    if isinstance(metrica, Counter):
+        metrica.inc(valor)
+    else:
+        metrica.observe(valor)
+
+
+@contextmanager
+def diferir_metricas():
+    ## Junta en una lista las observaciones del bloque en vez de registrarlas ##
+    # Para los renders en segundo plano: corren en un proceso que termina con el trabajo, así que sus
+    # métricas nunca llegarían a /metrics (y con PROMETHEUS_MULTIPROC_DIR dejarían un .db por proceso)
+    diferidas = _hilo.diferidas = []
+    try:
+        yield diferidas
+    finally:
+        _hilo.diferidas = None
+
+
+def registrar_diferidas(diferidas):
+    ## Registra en este proceso las observaciones que juntó diferir_metricas en otro ##
+    # Vuelven por el navegador: se descarta lo que no sea una métrica, etiqueta y valor admitidos
+    for entrada in diferidas if isinstance(diferidas, list) else []:
+        if not (isinstance(entrada, list) and len(entrada) == 3 and isinstance(entrada[1], list)):
+            continue
+        nombre, etiquetas, valor = entrada
+        if nombre == 'callback_subtipo' and len(etiquetas) == 1:
+            etiquetas = [etiqueta_subtipo(etiquetas[0])]
+        elif nombre not in ETIQUETAS_ADMITIDAS or len(etiquetas) != len(ETIQUETAS_ADMITIDAS[nombre]) or \
+                not all(e in admitidas for e, admitidas in zip(etiquetas, ETIQUETAS_ADMITIDAS[nombre])):
+            continue
+        if isinstance(valor, (int, float)) and math.isfinite(valor) and valor >= 0:
+            observar(nombre, etiquetas, valor)
+
+
+@contextmanager
+def fase(nombre):
+    ## Mide una fase del render ##
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        observar('fase', (nombre,), time.perf_counter() - inicio)
+
+
+def observar_callback(subtipo, fecha_inicio, fecha_fin, segundos):
+    ## Registra la latencia de una respuesta del mapa por subtipo y por tramo de periodo ##
+    observar('callback_subtipo', (etiqueta_subtipo(subtipo),), segundos)
+    observar('callback_periodo', (tramo_meses(fecha_inicio, fecha_fin),), segundos)
+
+
+@contextmanager
+def medir_callback(subtipo, fecha_inicio, fecha_fin):
+    ## Latencia completa del callback (incluye aciertos de cache), por subtipo y por tramo de periodo ##
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        observar_callback(subtipo, fecha_inicio, fecha_fin, time.perf_counter() - inicio)
+
+
+def contar_payload(**salidas):
+    ## Registra el tamaño (bytes UTF-8) de cada salida de texto del callback ##
+    for nombre, texto in salidas.items():
+        tamano = len(texto.encode('utf-8'))
+        observar('payload', (nombre,), tamano)
+        observar('payload_total', (nombre,), tamano)
+
+
+def registrar_metricas(server, ruta='/metrics'):
+    ## Expone las métricas en formato Prometheus sobre el servidor Flask de Dash ##
+    @server.route(ruta)
+    def metricas_prometheus():
+        # Con varios workers (gunicorn) cada proceso escribe en PROMETHEUS_MULTIPROC_DIR y aquí se suman
+        if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+            registro = CollectorRegistry()
+            multiprocess.MultiProcessCollector(registro)
+        else:
+            registro = REGISTRY
+        return Response(generate_latest(registro), mimetype=CONTENT_TYPE_LATEST)
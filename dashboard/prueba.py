@@ -1,31 +1,22 @@
-from pathlib import Path
 import streamlit as st
 import pandas as pd
-import geopandas as gpd
 import plotly.express as px
+from datos import cargar_incidencia, obtener_cubo, obtener_geometrias
 
-BASE_DIR = Path(__file__).resolve().parent.parent
-
-def cargar_datos():
-    ## Cargar df de incidencia municipal procesado y el shapefile municipal ##
-    df = pd.read_parquet(BASE_DIR / "01_datos/processed/Municipal-Delitos.parquet")
-    gdf = gpd.read_file(BASE_DIR /"01_datos/raw/mg_2025_integrado/conjunto_de_datos/00mun.shp")
-    gdf = gdf.to_crs(epsg=4326)
-    return df, gdf
-
-df, gdf = cargar_datos()
+## Geometría simplificada y ya en EPSG:4326 (ver datos.py), en lugar del shapefile crudo ##
+gdf = obtener_geometrias('nacional')
 
 print(gdf.head(10))
 
 
 
-## Sidebar de filtros ##
-subtipos = df['subtipo_de_delito'].cat.categories.tolist()
-selected_subtipo = st.sidebar.selectbox("Subtipo de delito", subtipos)
+## Sidebar de filtros (subtipos y fechas del cubo, sin leer el dataset) ##
+cubo = obtener_cubo()
+selected_subtipo = st.sidebar.selectbox("Subtipo de delito", sorted(cubo.subtipos))
 
 rango_fechas = st.sidebar.date_input(
     "Rango de fechas",
-    [df['fecha'].min(), df['fecha'].max()]
+    [cubo.fechas[0], cubo.ultimo_mes]
 )
 
 ## Filtrar datos ##
@@ -38,18 +29,14 @@ fecha_fin   = pd.to_datetime("2024-12-31")
 rango_fechas = [fecha_inicio, fecha_fin]
 
 
-df_filtrado = df[
-    (df["subtipo_de_delito"] == selected_subtipo) & 
-    (df["fecha"] >=  pd.to_datetime(rango_fechas[0])) &
-    (df["fecha"] <= pd.to_datetime(rango_fechas[1])) 
-]
+# Solo se leen los row groups del subtipo y periodo (filtros empujados a pyarrow)
+df_filtrado = cargar_incidencia(selected_subtipo, rango_fechas[0], rango_fechas[1])
 
 ## Agregar totales por municipio ##
 df_agrupado = df_filtrado.groupby('cve_municipio')['total'].sum().reset_index()
 
 
 ## Unir a geometría municipal ##
-gdf = gdf.rename(columns={'CVEGEO':'cve_municipio'})
 gdf_mapa = gdf.merge(df_agrupado, on = 'cve_municipio', how = 'left').fillna(0)
 
 print(df_filtrado.head(10))
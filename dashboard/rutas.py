@@ -0,0 +1,13 @@
+import os
+import sys
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+# Carpeta de datos; INCIDENCIA_DATOS la redirige (p. ej. a los datos sintéticos del benchmark)
+DATOS_DIR = Path(os.environ.get("INCIDENCIA_DATOS", BASE_DIR / "01_datos"))
+
+# Módulos compartidos con el pipeline (p. ej. catalogo.py); se importan como los del dashboard
+COMUN_DIR = BASE_DIR / "comun"
+if str(COMUN_DIR) not in sys.path:
+    sys.path.append(str(COMUN_DIR))
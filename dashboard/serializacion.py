@@ -0,0 +1,38 @@
+import gzip
+import os
+import numpy as np
+import shapely
+from metricas import observar
+
+# 5 decimales de grado ≈ 1 m: de sobra para un coroplético municipal
+DECIMALES = 5
+
+# Comprimir para medir cuesta una pasada de gzip por render (no por acierto de cache); se puede apagar
+REPORTAR_TAMANOS = os.environ.get("INCIDENCIA_REPORTE_PAYLOAD", "1") != "0"
+
+# Nivel por omisión de flask-compress (COMPRESS_LEVEL)
+NIVEL_GZIP = 6
+
+
+def cuantizar(geometrias, decimales=DECIMALES):
+    ## Redondea todas las coordenadas a un número fijo de decimales, en una sola pasada vectorizada ##
+    return shapely.transform(np.asarray(geometrias), lambda coords: np.round(coords, decimales))
+
+
+def preparar_capa(gdf, columnas, decimales=DECIMALES):
+    ## Solo las columnas que usa el mapa, con coordenadas cuantizadas ##
+    capa = gdf[[*columnas, gdf.geometry.name]].copy()
+    capa[gdf.geometry.name] = cuantizar(capa.geometry.array, decimales)
+    return capa
+
+
+def reportar_respuesta(nombre, texto):
+    ## Registra los bytes que viajan al navegador: el texto de la respuesta sin comprimir y con gzip ##
+    # gzip es lo que aplica compress=True a clientes sin brotli; brotli queda algo por debajo
+    if not REPORTAR_TAMANOS:
+        return None
+    datos = texto.encode('utf-8')
+    bytes_texto, bytes_gzip = len(datos), len(gzip.compress(datos, compresslevel=NIVEL_GZIP))
+    observar('respuesta', (nombre, 'identidad'), bytes_texto)
+    observar('respuesta', (nombre, 'gzip'), bytes_gzip)
+    return bytes_texto, bytes_gzip
@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+from flask import abort, request
+from datos import obtener_cubo
+
+# Meses de la media móvil y desfase de la variación anual
+VENTANA = 12
+
+
+def media_movil(valores, ventana=VENTANA):
+    ## Media móvil por diferencias de la suma acumulada; NaN hasta completar la primera ventana ##
+    acumulado = np.concatenate([[0.0], np.cumsum(valores, dtype='float64')])
+    media = np.full(len(valores), np.nan)
+    media[ventana - 1:] = (acumulado[ventana:] - acumulado[:-ventana]) / ventana
+    return media
+
+
+def variacion_anual(valores, desfase=VENTANA):
+    ## Cambio relativo contra el mismo mes del año anterior; NaN si no hay base ##
+    valores = np.asarray(valores, dtype='float64')
+    anterior = np.full(len(valores), np.nan)
+    anterior[desfase:] = valores[:-desfase]
+    variacion = np.full(len(valores), np.nan)
+    np.divide(valores - anterior, anterior, out=variacion, where=anterior > 0)
+    return variacion
+
+
+def serie_municipio(subtipo, id_municipio, fecha_inicio=None, fecha_fin=None):
+    ## Serie mensual con media móvil y variación anual, opcionalmente recortada a un periodo ##
+    # Las estadísticas se calculan sobre la serie completa: el recorte no pierde la primera ventana
+    # La serie termina en el último mes publicado: los meses vacíos del año en curso no son ceros reales
+    # y bajarían la media móvil y la variación anual
+    cubo = obtener_cubo()
+    total = cubo.serie(subtipo, id_municipio)[:cubo.n_publicados]
+    serie = pd.DataFrame({
+        'fecha': cubo.fechas[:cubo.n_publicados],
+        'total': total,
+        'media_movil_12': media_movil(total),
+        'variacion_anual': variacion_anual(total)
+    })
+    if fecha_inicio is not None or fecha_fin is not None:
+        i0, i1 = cubo.indices_periodo(fecha_inicio or cubo.fechas[0], fecha_fin or cubo.ultimo_mes)
+        serie = serie.iloc[i0:i1]
+    return serie
+
+
+def registrar_series(server, prefijo='/series'):
+    ## Monta /series/<cve_municipio>?subtipo=...&inicio=YYYY-MM&fin=YYYY-MM sobre el servidor Flask de Dash ##
+
+    @server.route(f"{prefijo}/<cve_municipio>")
+    def serie_json(cve_municipio):
+        subtipo = request.args.get('subtipo')
+        cubo = obtener_cubo()
+        if subtipo not in cubo.subtipos or cve_municipio not in cubo.municipios:
+            abort(404)
+
+        serie = serie_municipio(
+            subtipo,
+            cubo.municipios.get_loc(cve_municipio),
+            request.args.get('inicio'),
+            request.args.get('fin')
+        )
+        # NaN no es JSON válido
+        columnas = serie.drop(columns='fecha').astype(object)
+        columnas = columnas.where(columnas.notna(), None)
+        return {
+            'cve_municipio': cve_municipio,
+            'subtipo': subtipo,
+            'fecha': serie['fecha'].dt.strftime('%Y-%m').tolist(),
+            **{c: columnas[c].tolist() for c in columnas}
+        }
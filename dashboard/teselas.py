@@ -0,0 +1,81 @@
+import hashlib
+import sqlite3
+import threading
+from pathlib import Path
+from flask import Response, abort, request
+
+_conexiones = threading.local()
+
+
+def conexion_mbtiles(path):
+    ## Conexión de solo lectura al MBTiles, una por hilo y por (ruta, mtime), y si trae ETags ##
+    # Si Generar_teselas.py reemplazó el archivo, la conexión vieja seguiría leyendo el anterior
+    mtime = Path(path).stat().st_mtime_ns
+    abiertas = getattr(_conexiones, 'abiertas', None)
+    if abiertas is None:
+        abiertas = _conexiones.abiertas = {}
+    clave = str(path)
+    if clave in abiertas:
+        mtime_abierta, con, con_etags = abiertas[clave]
+        if mtime_abierta == mtime:
+            return con, con_etags
+        con.close()
+    con = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    con_etags = con.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'etags'"
+    ).fetchone() is not None
+    abiertas[clave] = (mtime, con, con_etags)
+    return con, con_etags
+
+
+def leer_tesela(path, z, x, y):
+    ## Lee una tesela XYZ del MBTiles (guardado con filas TMS) y su ETag; None si no existe ##
+    # El ETag se calcula al generar (tabla etags); un MBTiles de otra herramienta no la tiene
+    con, con_etags = conexion_mbtiles(path)
+    if con_etags:
+        consulta = ("SELECT tile_data, etag FROM tiles LEFT JOIN etags USING (zoom_level, tile_column, tile_row) "
+                    "WHERE zoom_level = ? AND tile_column = ? AND tile_row = ?")
+    else:
+        consulta = "SELECT tile_data, NULL FROM tiles WHERE zoom_level = ? AND tile_column = ? AND tile_row = ?"
+    fila = con.execute(consulta, (z, x, 2 ** z - 1 - y)).fetchone()
+    if fila is None:
+        return None
+    datos, etag = fila
+    return datos, etag or hashlib.md5(datos).hexdigest()
+
+
+def registrar_teselas(server, path, prefijo='/teselas', max_age=86400):
+    ## Monta las rutas de teselas vectoriales sobre el servidor Flask de Dash ##
+    path = Path(path)
+
+    @server.route(f"{prefijo}/<int:z>/<int:x>/<int:y>.pbf")
+    def tesela_municipios(z, x, y):
+        if not path.exists():
+            abort(404)
+        tesela = leer_tesela(path, z, x, y)
+        if tesela is None:
+            return Response(status=204)
+        datos, etag = tesela
+
+        # Las teselas se guardan comprimidas con gzip
+        resp = Response(datos, mimetype='application/x-protobuf')
+        resp.headers['Content-Encoding'] = 'gzip'
+        resp.set_etag(etag)
+        resp.cache_control.public = True
+        resp.cache_control.max_age = max_age
+        return resp.make_conditional(request)
+
+    @server.route(f"{prefijo}/municipios.json")
+    def tilejson_municipios():
+        if not path.exists():
+            abort(404)
+        metadata = dict(conexion_mbtiles(path)[0].execute("SELECT name, value FROM metadata").fetchall())
+        return {
+            'tilejson': '2.2.0',
+            'name': metadata.get('name'),
+            'format': metadata.get('format'),
+            'minzoom': int(metadata.get('minzoom', 0)),
+            'maxzoom': int(metadata.get('maxzoom', 0)),
+            'bounds': [float(v) for v in metadata.get('bounds', '').split(',') if v],
+            'tiles': [request.host_url.rstrip('/') + prefijo + "/{z}/{x}/{y}.pbf"]
+        }
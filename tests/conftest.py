@@ -0,0 +1,7 @@
+import sys
+from pathlib import Path
+
+# Los scripts se importan como módulos sueltos, igual que al correrlos desde su carpeta
+BASE_DIR = Path(__file__).resolve().parent.parent
+for carpeta in ("02_scripts", "comun", "dashboard", "03_benchmarks"):
+    sys.path.insert(0, str(BASE_DIR / carpeta))
@@ -0,0 +1,115 @@
+import os
+import threading
+import time
+import pytest
+
+pytest.importorskip("pandas")
+
+from cache import CacheLRU
+
+
+def test_desaloja_lo_menos_usado():
+    cache = CacheLRU(max_elementos=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    cache.get('a')
+    cache.put('c', 3)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1 and cache.get('c') == 3
+    assert cache.metricas()['desalojos'] == 1
+
+
+def test_cota_en_bytes_conserva_el_ultimo():
+    cache = CacheLRU(max_elementos=10, max_bytes=1000)
+    cache.put('a', b'x' * 600)
+    cache.put('b', b'x' * 600)
+    assert len(cache) == 1 and cache.get('b') is not None
+    cache.put('c', b'x' * 5000)
+    assert len(cache) == 1 and cache.get('c') is not None
+
+
+def test_nivel_en_disco_sobrevive_a_la_instancia(tmp_path):
+    CacheLRU(directorio=tmp_path).put(('v1', 'Robo', '2024-01', '2024-12'), [1, 2, 3])
+    otra = CacheLRU(directorio=tmp_path)
+    assert otra.get(('v1', 'Robo', '2024-01', '2024-12')) == [1, 2, 3]
+    assert otra.metricas()['aciertos_disco'] == 1
+
+
+def test_nivel_en_disco_acotado_en_bytes(tmp_path):
+    cache = CacheLRU(max_elementos=1, max_bytes_disco=3000, directorio=tmp_path)
+    for i in range(10):
+        cache.put(('v1', i), b'x' * 1000)
+        # mtime distinto por archivo: es el orden de desalojo
+        os.utime(cache._ruta(('v1', i)), (i, i))
+    archivos = list(tmp_path.glob("*/*.pkl"))
+    assert sum(a.stat().st_size for a in archivos) <= 3000
+    assert cache._ruta(('v1', 9)).exists()
+    assert not cache._ruta(('v1', 0)).exists()
+
+
+def test_version_nueva_borra_las_anteriores(tmp_path):
+    cache = CacheLRU(directorio=tmp_path)
+    cache.put(('v1', 'Robo'), 1)
+    cache.put(('v2', 'Robo'), 2)
+    assert [p.name for p in tmp_path.iterdir()] == ['v2']
+    assert CacheLRU(directorio=tmp_path).get(('v1', 'Robo')) is None
+
+
+def test_version_vieja_no_borra_la_nueva(tmp_path):
+    # Un worker con el cubo anterior escribe después de que Precalentar_cache.py llenó la versión nueva
+    CacheLRU(directorio=tmp_path).put(('20250102000000', 'Robo'), 2)
+    CacheLRU(directorio=tmp_path).put(('20250101000000', 'Robo'), 1)
+    assert CacheLRU(directorio=tmp_path).get(('20250102000000', 'Robo')) == 2
+
+
+def test_peticiones_iguales_calculan_una_vez():
+    cache = CacheLRU()
+    llamadas = []
+
+    def calcular():
+        llamadas.append(1)
+        time.sleep(0.05)
+        return 42
+
+    hilos = [threading.Thread(target=cache.obtener, args=('k', calcular)) for _ in range(5)]
+    for h in hilos:
+        h.start()
+    for h in hilos:
+        h.join()
+    assert len(llamadas) == 1
+    assert cache.get('k') == 42
+
+
+def test_entre_procesos_calcula_una_vez(tmp_path):
+    diskcache = pytest.importorskip("diskcache")
+    pytest.importorskip("psutil")
+    registro = diskcache.Cache(str(tmp_path / "registro"))
+    llamadas = []
+
+    def calcular():
+        llamadas.append(1)
+        time.sleep(0.1)
+        return 42
+
+    # Una instancia por hilo, como un proceso de render cada una; solo comparten el disco y el registro
+    resultados = []
+    hilos = [
+        threading.Thread(target=lambda: resultados.append(
+            CacheLRU(directorio=tmp_path / "mapas").obtener_entre_procesos('k', calcular, registro, espera=0.01)))
+        for _ in range(4)
+    ]
+    for h in hilos:
+        h.start()
+    for h in hilos:
+        h.join()
+    assert len(llamadas) == 1 and resultados == [42] * 4
+
+
+def test_entre_procesos_toma_la_marca_de_un_proceso_muerto(tmp_path):
+    diskcache = pytest.importorskip("diskcache")
+    pytest.importorskip("psutil")
+    registro = diskcache.Cache(str(tmp_path / "registro"))
+    cache = CacheLRU(directorio=tmp_path / "mapas")
+    # Un render cancelado deja su marca con un pid que ya no existe
+    registro.set(('calculando', str(cache.directorio), repr('k')), 2**22 + 12345)
+    assert cache.obtener_entre_procesos('k', lambda: 7, registro, espera=0.01) == 7
@@ -0,0 +1,44 @@
+import json
+import pytest
+
+pd = pytest.importorskip("pandas")
+
+from catalogo import actualizar_catalogo, cargar_catalogo, codificar
+
+
+def test_sin_archivo_el_catalogo_esta_vacio(tmp_path):
+    assert cargar_catalogo(tmp_path / "catalogo.json") == {'municipios': [], 'subtipos': []}
+
+
+def test_solo_crece_por_el_final(tmp_path):
+    path = tmp_path / "catalogo.json"
+    actualizar_catalogo(['02001', '01001'], ['Robo'], path=path)
+    catalogo = actualizar_catalogo(['01001', '03001', '00999'], ['Homicidio doloso', 'Robo'], path=path)
+
+    # Las claves existentes conservan su posición; las nuevas se agregan al final, ordenadas
+    assert catalogo['municipios'] == ['01001', '02001', '00999', '03001']
+    assert catalogo['subtipos'] == ['Robo', 'Homicidio doloso']
+    assert cargar_catalogo(path) == catalogo
+
+
+def test_sin_claves_nuevas_no_reescribe(tmp_path):
+    path = tmp_path / "catalogo.json"
+    actualizar_catalogo(['01001'], ['Robo'], path=path)
+    path.write_text(json.dumps({'municipios': ['01001'], 'subtipos': ['Robo']}), encoding="utf-8")
+    antes = path.stat().st_mtime_ns
+    actualizar_catalogo(['01001'], ['Robo'], path=path)
+    assert path.stat().st_mtime_ns == antes
+
+
+def test_codificar_texto_y_categorico():
+    lista = ['01001', '02001', '03001']
+    claves = ['03001', '01001', '03001']
+    esperado = [2, 0, 2]
+    assert codificar(claves, lista).tolist() == esperado
+    assert codificar(pd.Series(claves, dtype='category'), lista).tolist() == esperado
+    assert codificar(claves, lista).dtype == 'int32'
+
+
+def test_codificar_falla_con_claves_fuera_del_catalogo():
+    with pytest.raises(KeyError, match='09999'):
+        codificar(['01001', '09999'], ['01001'])
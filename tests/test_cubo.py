@@ -0,0 +1,60 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+pd = pytest.importorskip("pandas")
+pytest.importorskip("pyarrow")
+pytest.importorskip("janitor")
+
+import Funciones_Procesamiento as fp
+from catalogo import actualizar_catalogo
+from cubo import CuboIncidencia
+from datos_sinteticos import generar_csv
+
+PERIODOS = [('2023-01-01', '2025-12-31'), ('2024-03-15', '2024-08-02'), ('2025-07-01', '2025-12-31')]
+
+
+@pytest.fixture
+def largo(tmp_path, monkeypatch):
+    ## Tabla larga del pipeline sobre un CSV sintético, con el catálogo en tmp_path ##
+    path = tmp_path / "sintetico.csv"
+    generar_csv(path, anos=range(2023, 2026), n_municipios=40, n_subtipos=3, meses_ultimo_ano=9)
+    claves = fp.leer_claves(path)
+    catalogo = actualizar_catalogo(claves['cve_municipio'], claves['subtipo_de_delito'],
+                                   path=tmp_path / "catalogo.json")
+    monkeypatch.setattr(fp, 'cargar_catalogo', lambda: catalogo)
+    return fp.procesar(fp.leer_datos(path))
+
+
+def esperado(largo, subtipo, fecha_inicio, fecha_fin, municipios):
+    ## Groupby con máscara sobre la tabla larga, a granularidad mensual como el cubo ##
+    inicio = pd.Timestamp(fecha_inicio).to_period('M').to_timestamp()
+    mascara = ((largo['subtipo_de_delito'] == subtipo)
+               & (largo['fecha'] >= inicio) & (largo['fecha'] <= pd.Timestamp(fecha_fin)))
+    por_municipio = largo[mascara].groupby('cve_municipio', observed=True)['total'].sum()
+    return por_municipio.reindex(municipios, fill_value=0).to_numpy('int64')
+
+
+def test_totales_igual_a_groupby_de_la_tabla_larga(largo, tmp_path):
+    fp.guardar_cubo(*fp.construir_cubo(largo), tmp_path / "cubo")
+    cubo = CuboIncidencia(tmp_path / "cubo")
+
+    assert cubo.ultimo_mes == pd.Timestamp('2025-09-01')
+    for subtipo in cubo.subtipos:
+        for inicio, fin in PERIODOS:
+            np.testing.assert_array_equal(
+                cubo.totales(subtipo, inicio, fin).to_numpy(),
+                esperado(largo, subtipo, inicio, fin, cubo.municipios)
+            )
+
+
+def test_cubo_abierto_no_ve_la_reescritura(largo, tmp_path):
+    # guardar_cubo reemplaza los archivos: el mmap de un worker sigue leyendo el cubo anterior completo
+    fp.guardar_cubo(*fp.construir_cubo(largo), tmp_path / "cubo")
+    abierto = CuboIncidencia(tmp_path / "cubo")
+    subtipo = abierto.subtipos[0]
+    antes = abierto.totales(subtipo, *PERIODOS[0]).to_numpy().copy()
+
+    fp.guardar_cubo(*fp.construir_cubo(largo.assign(total=largo['total'] * 2)), tmp_path / "cubo")
+    np.testing.assert_array_equal(abierto.totales(subtipo, *PERIODOS[0]).to_numpy(), antes)
+    np.testing.assert_array_equal(CuboIncidencia(tmp_path / "cubo").totales(subtipo, *PERIODOS[0]).to_numpy(), antes * 2)
+    assert not list((tmp_path / "cubo").glob("*.tmp"))
@@ -0,0 +1,25 @@
+import pytest
+
+pd = pytest.importorskip("pandas")
+pq = pytest.importorskip("pyarrow.parquet")
+pytest.importorskip("janitor")
+
+from Funciones_Procesamiento import escribir_particion
+
+
+def test_cada_subtipo_en_sus_propios_row_groups(tmp_path):
+    df = pd.DataFrame({
+        'id_subtipo': [2, 0, 1, 0, 2, 2],
+        'fecha': pd.to_datetime(['2024-01-01'] * 6),
+        'id_municipio': [0, 1, 0, 0, 1, 2],
+        'total': [1, 2, 3, 4, 5, 6]
+    })
+    escribir_particion(df, tmp_path / "2024/01.parquet")
+
+    metadata = pq.ParquetFile(tmp_path / "2024/01.parquet").metadata
+    columna = metadata.schema.names.index('id_subtipo')
+    rangos = [
+        (metadata.row_group(i).column(columna).statistics.min, metadata.row_group(i).column(columna).statistics.max)
+        for i in range(metadata.num_row_groups)
+    ]
+    assert rangos == [(0, 0), (1, 1), (2, 2)]
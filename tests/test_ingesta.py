@@ -0,0 +1,31 @@
+import pytest
+
+pytest.importorskip("pandas")
+pytest.importorskip("janitor")
+pytest.importorskip("geopandas")
+
+from Funciones_Procesamiento import leer_datos
+from Ingesta_incremental import huellas_por_particion
+from datos_sinteticos import generar_csv
+
+
+def leer_sintetico(path, meses_ultimo_ano):
+    generar_csv(path, anos=range(2023, 2026), n_municipios=40, n_subtipos=3, meses_ultimo_ano=meses_ultimo_ano)
+    return leer_datos(path)
+
+
+def test_mes_nuevo_solo_cambia_particiones_del_ultimo_ano(tmp_path):
+    # Con septiembre como último mes, octubre a diciembre quedan vacíos y read_csv los lee como float64;
+    # al publicarse octubre esa columna pasa a int64, pero 2023 y 2024 no cambiaron
+    antes = huellas_por_particion(leer_sintetico(tmp_path / "sep.csv", 9))
+    despues = huellas_por_particion(leer_sintetico(tmp_path / "oct.csv", 10))
+
+    assert antes.keys() == despues.keys()
+    cambiadas = {p for p in antes if antes[p] != despues[p]}
+    assert cambiadas == {p for p in antes if p.startswith("2025/")}
+
+
+def test_huellas_no_dependen_del_dtype_de_los_meses(tmp_path):
+    df = leer_sintetico(tmp_path / "base.csv", 12)
+    como_float = df.astype({"enero": "float64", "diciembre": "float64"})
+    assert huellas_por_particion(df) == huellas_por_particion(como_float)
@@ -0,0 +1,29 @@
+import pytest
+
+pytest.importorskip("pandas")
+pytest.importorskip("flask")
+prometheus_client = pytest.importorskip("prometheus_client")
+
+from metricas import diferir_metricas, fase, registrar_diferidas
+
+
+def observaciones_fase(nombre):
+    return prometheus_client.REGISTRY.get_sample_value('incidencia_fase_segundos_count', {'fase': nombre}) or 0
+
+
+def test_diferidas_se_registran_al_devolverlas():
+    antes = observaciones_fase('render_html')
+    with diferir_metricas() as diferidas:
+        with fase('render_html'):
+            pass
+    # Dentro del bloque no se registró nada; al registrarlas (en el worker web) sí
+    assert observaciones_fase('render_html') == antes
+    registrar_diferidas(diferidas)
+    assert observaciones_fase('render_html') == antes + 1
+
+
+def test_diferidas_descartan_lo_no_admitido():
+    antes = observaciones_fase('render')
+    registrar_diferidas([['fase', ['inventada'], 1.0], ['otra_metrica', [], 1.0], ['fase', ['render'], -1]])
+    assert observaciones_fase('inventada') == 0
+    assert observaciones_fase('render') == antes
@@ -0,0 +1,24 @@
+import pytest
+
+pytest.importorskip("pandas")
+pytest.importorskip("pyarrow")
+pytest.importorskip("janitor")
+pytest.importorskip("polars")
+
+import Funciones_Procesamiento as fp
+from catalogo import actualizar_catalogo
+from datos_sinteticos import generar_csv
+from Procesamiento_polars import verificar_paridad
+
+
+def test_polars_y_pandas_dan_el_mismo_resultado(tmp_path, monkeypatch):
+    # Último año incompleto: los meses vacíos son el caso donde los dos motores infieren tipos distintos
+    path = tmp_path / "sintetico.csv"
+    generar_csv(path, anos=range(2023, 2026), n_municipios=40, n_subtipos=3, meses_ultimo_ano=9)
+    claves = fp.leer_claves(path)
+    catalogo = actualizar_catalogo(claves['cve_municipio'], claves['subtipo_de_delito'],
+                                   path=tmp_path / "catalogo.json")
+    monkeypatch.setattr(fp, 'cargar_catalogo', lambda: catalogo)
+
+    df = verificar_paridad(path)
+    assert len(df) == 40 * 3 * 3 * 12
@@ -0,0 +1,36 @@
+import json
+import pytest
+
+np = pytest.importorskip("numpy")
+pd = pytest.importorskip("pandas")
+pytest.importorskip("flask")
+
+import series
+from cubo import CuboIncidencia
+
+
+@pytest.fixture
+def cubo(tmp_path, monkeypatch):
+    ## Un subtipo, un municipio, dos años; el segundo publicado hasta marzo ##
+    mensual = np.array([[[10] * 12 + [10, 10, 10] + [0] * 9]], dtype='int32')
+    acumulado = np.zeros((1, 1, 25), dtype='int32')
+    np.cumsum(mensual, axis=2, out=acumulado[:, :, 1:])
+    np.save(tmp_path / "acumulado.npy", acumulado)
+    with open(tmp_path / "indices.json", "w", encoding="utf-8") as f:
+        json.dump({'subtipos': ['Robo'], 'municipios': ['01001'], 'fecha_inicio': '2023-01',
+                   'n_meses': 24, 'ultimo_mes': '2024-03', 'version': 'v1'}, f)
+    cubo = CuboIncidencia(tmp_path)
+    monkeypatch.setattr(series, 'obtener_cubo', lambda: cubo)
+    return cubo
+
+
+def test_serie_termina_en_el_ultimo_mes_publicado(cubo):
+    serie = series.serie_municipio('Robo', 0)
+    assert serie['fecha'].iloc[-1] == pd.Timestamp('2024-03-01')
+    assert serie['media_movil_12'].iloc[-1] == 10
+    assert serie['variacion_anual'].iloc[-1] == 0
+
+
+def test_periodo_posterior_al_ultimo_mes_se_recorta(cubo):
+    serie = series.serie_municipio('Robo', 0, '2024-01-01', '2024-12-31')
+    assert serie['fecha'].dt.strftime('%Y-%m').tolist() == ['2024-01', '2024-02', '2024-03']